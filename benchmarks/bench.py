@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+Offline benchmarks for the bot's hot paths
+-------------------------------------------
+
+Starts local_server/server.py as a stand-in for api.scpslgame.com, then drives
+the real poll loop and command handlers from main.py with fake Discord objects.
+Needs no network access and no bot token.
+
+$ python benchmarks/bench.py --servers 50 --polls 20 --messages 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_SERVER = os.path.join(REPO_PATH, "local_server", "server.py")
+API_KEY = "bench"
+
+
+# Mock server configuration generating serverinfo.php responses for every simulated server id
+def build_mock_config(server_count, port):
+    return {
+        "hostname": "127.0.0.1",
+        "port": port,
+        "quiet": True,
+        "responses": [{
+            "method": "GET",
+            "path": "/serverinfo.php",
+            "generator": {"type": "scpsl", "servers": server_count, "slots": 30, "period": 60},
+            "headers": [{"Content-Type": "application/json"}],
+        }],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(config_path, port, timeout=10):
+    process = subprocess.Popen(
+        [sys.executable, MOCK_SERVER, "-f", config_path],
+        cwd=os.path.dirname(MOCK_SERVER),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Mock server did not start")
+
+
+# Latency samples for one benchmark, reported as throughput and percentiles
+class Measurement:
+    def __init__(self, name):
+        self.name = name
+        self.replies = None
+        self.reactions = None
+        self.samples = []
+        self.started = None
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+        return False
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def report(self, unit="op"):
+        count = len(self.samples)
+        if not count:
+            return f"{self.name:<24} no samples"
+        return (
+            f"{self.name:<24} {count:>7} {unit}s  {count / self.elapsed:>10.1f} {unit}/s  "
+            f"p50 {self.percentile(0.50) * 1000:>8.3f} ms  p99 {self.percentile(0.99) * 1000:>8.3f} ms"
+            + (f"  {self.replies} replies" if self.replies is not None else "")
+            + (f"  {self.reactions} reactions" if self.reactions else "")
+        )
+
+
+# Stand-ins for the Discord objects the handlers touch
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = 0
+        self.reactions = 0
+
+
+class FakeClient:
+    def __init__(self):
+        self.presence_updates = 0
+
+    async def change_presence(self, status=None, activity=None):
+        self.presence_updates += 1
+
+
+def make_message(state, content, author_id, channel, guild):
+    author = SimpleNamespace(id=author_id, bot=False, mention=f"<@{author_id}>")
+
+    async def add_reaction(emoji):
+        channel.reactions += 1
+
+    return SimpleNamespace(
+        id=time.perf_counter_ns(),
+        content=content,
+        author=author,
+        channel=channel,
+        guild=guild,
+        mentions=[],
+        role_mentions=[],
+        channel_mentions=[],
+        attachments=[],
+        add_reaction=add_reaction,
+        _state=state,
+    )
+
+
+def load_bot(blacklist_size):
+    # main.py writes its data files to the working directory, so keep them out of the repo
+    os.chdir(tempfile.mkdtemp(prefix="scpsl-bench-"))
+    sys.path.insert(0, REPO_PATH)
+    import main
+
+    from logs import setup_logging
+    from discord.ext import commands
+
+    setup_logging("WARNING")
+
+    class BenchContext(commands.Context):
+        async def send(self, content=None, **kwargs):
+            self.channel.sent += 1
+            return SimpleNamespace(jump_url=f"https://discord.com/channels/0/{self.channel.id}/{self.channel.sent}")
+
+    original_get_context = main.client.get_context
+
+    async def get_context(origin, *, cls=BenchContext):
+        return await original_get_context(origin, cls=cls)
+
+    main.client.get_context = get_context
+    main.client._connection.user = SimpleNamespace(id=0)
+    main.client.ws = SimpleNamespace(latency=0.05, open=False)
+    main.presence.client = FakeClient()
+    # The default config blacklists "!", which would drop every command before it is handled
+    set_blacklist(main, blacklist_size)
+    return main
+
+
+def set_blacklist(main, size):
+    from blacklist import BlacklistMatcher
+
+    main.blacklist_matcher = BlacklistMatcher([f"blockedword{i}" for i in range(size)])
+
+
+async def bench_polls(main, server_count, polls, base_url, max_concurrent):
+    from poller import ServerTarget
+
+    main.SERVERS = [ServerTarget(server_id, API_KEY, base_url=base_url) for server_id in range(1, server_count + 1)]
+    main.MAX_CONCURRENT_REQUESTS = max_concurrent
+    session = await main.create_session()
+    measurement = Measurement(f"poll x{server_count} servers")
+    try:
+        with measurement:
+            for _ in range(polls):
+                started = time.perf_counter()
+                await main.set_bot_status(session)
+                measurement.samples.append(time.perf_counter() - started)
+    finally:
+        await session.close()
+    return measurement
+
+
+async def bench_messages(main, messages, content, name):
+    channels = [FakeChannel(channel_id) for channel_id in range(10)]
+    guilds = [SimpleNamespace(id=guild_id) for guild_id in range(5)]
+    measurement = Measurement(name)
+    with measurement:
+        for i in range(messages):
+            message = make_message(main.client._connection, content, 1000 + i % 50, channels[i % len(channels)], guilds[i % len(guilds)])
+            started = time.perf_counter()
+            await main.on_message(message)
+            measurement.samples.append(time.perf_counter() - started)
+    measurement.replies = sum(channel.sent for channel in channels)
+    measurement.reactions = sum(channel.reactions for channel in channels)
+    return measurement
+
+
+async def run_benchmarks(main, args, base_url):
+    tracemalloc.start()
+    results = [
+        await bench_polls(main, args.servers, args.polls, base_url, args.concurrency),
+        await bench_messages(main, args.messages, "hello there, how is everyone doing today?", "on_message (no command)"),
+        await bench_messages(main, args.messages, "!ping", "!ping"),
+    ]
+    # Per-message cost should stay flat as the blacklist grows
+    for size in args.blacklist_sizes:
+        set_blacklist(main, size)
+        results.append(await bench_messages(main, args.messages, "hello there, how is everyone doing today?", f"blacklist x{size}"))
+    set_blacklist(main, args.blacklist_size)
+
+    # Synthetic traffic from a few users is mostly rate limited, which is part of what gets measured
+    results.append(await bench_messages(main, args.messages, "!players", "!players"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, peak
+
+
+async def run(args):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as config_file:
+        json.dump(build_mock_config(args.servers, port), config_file)
+
+    process = start_mock_server(config_file.name, port)
+    try:
+        main = load_bot(args.blacklist_size)
+        # Entering the client sets up its event loop hooks without logging in
+        async with main.client:
+            results, peak = await run_benchmarks(main, args, base_url)
+        main.renderer.shutdown()
+    finally:
+        process.terminate()
+        process.wait()
+        os.remove(config_file.name)
+
+    for measurement in results:
+        print(measurement.report())
+    print(f"{'peak traced memory':<24} {peak / 1024 / 1024:.1f} MiB")
+    print(f"{'max RSS':<24} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+def get_opts():
+    parser = argparse.ArgumentParser(description="Benchmark the poll and command paths against the local mock server.")
+    parser.add_argument("--servers", type=int, default=50, help="Number of simulated SCP:SL servers.")
+    parser.add_argument("--polls", type=int, default=20, help="Number of poll rounds.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Maximum API requests in flight.")
+    parser.add_argument("--blacklist-size", type=int, default=100, help="Number of blacklisted words checked per message.")
+    parser.add_argument("--blacklist-sizes", type=lambda text: [int(size) for size in text.split(",")],
+                        default=[10, 100, 1000, 10000], help="Comma separated blacklist sizes to compare.")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages sent through on_message per benchmark.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(get_opts()))
@@ -0,0 +1,56 @@
+import re
+
+# Build a regex from a trie of the words, so words sharing a prefix share one branch and the
+# engine does roughly the same work per message however long the list gets
+def _trie_pattern(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+def _node_pattern(node):
+    ends_here = "" in node
+    branches = [re.escape(char) + _node_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    if len(branches) == 1 and not ends_here:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    return pattern + "?" if ends_here else pattern
+
+# Matches messages against the blacklist from config.yml with a single compiled pattern
+class BlacklistMatcher:
+    def __init__(self, words, whole_word=False, case_sensitive=False):
+        self.case_sensitive = case_sensitive
+        self.whole_word = whole_word
+        self.words = tuple(sorted({self._fold(str(word)) for word in words or () if word}))
+        self._pattern = None
+        if self.words:
+            pattern = _trie_pattern(self.words)
+            if whole_word:
+                pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+            self._pattern = re.compile(pattern)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.get("BLACKLIST", []),
+            whole_word=config.get("BLACKLIST_WHOLE_WORD", False),
+            case_sensitive=config.get("BLACKLIST_CASE_SENSITIVE", False),
+        )
+
+    def _fold(self, text):
+        return text if self.case_sensitive else text.casefold()
+
+    # The first blacklisted word found in text, or None
+    def search(self, text):
+        if self._pattern is None:
+            return None
+        match = self._pattern.search(self._fold(text))
+        return match.group(0) if match else None
+
+    def __len__(self):
+        return len(self.words)
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import yaml
+from loguru import logger
+from history import parse_window
+from rollups import TIERS
+
+# Expected type of each known setting; anything else in config.yml is left unchecked
+CONFIG_TYPES = {
+    "WAIT_TIME": (int, float),
+    "POLL_JITTER": (int, float),
+    "ADAPTIVE_POLLING": bool,
+    "ADAPTIVE_MIN_INTERVAL": (int, float),
+    "ADAPTIVE_MAX_INTERVAL": (int, float),
+    "REQUEST_BUDGET_PER_HOUR": (int, float),
+    "ENABLE_STATUS": bool,
+    "PRESENCE_MIN_INTERVAL": (int, float),
+    "LIVE_STATUS_CHANNELS": list,
+    "LIVE_STATUS_MIN_INTERVAL": (int, float),
+    "LIVE_STATUS_PIN": bool,
+    "PLAYERS_RATE_LIMITS": dict,
+    "PLAYERS_NOTICE_LIMIT": list,
+    "SERVER_INDEX": int,
+    "SERVERS": list,
+    "API_BASE_URL": str,
+    "MAX_CONCURRENT_REQUESTS": int,
+    "API_CONNECT_TIMEOUT": (int, float),
+    "API_READ_TIMEOUT": (int, float),
+    "API_RETRIES": int,
+    "BREAKER_THRESHOLD": int,
+    "BREAKER_RESET_TIMEOUT": (int, float),
+    "PERSIST_SNAPSHOT": bool,
+    "HISTORY_CAPACITY": int,
+    "ROLLUP_RETENTION": dict,
+    "TRACK_SESSIONS": bool,
+    "RENDER_POOL": str,
+    "RENDER_WORKERS": int,
+    "RENDER_THEME": str,
+    "BLACKLIST": list,
+    "BLACKLIST_WHOLE_WORD": bool,
+    "BLACKLIST_CASE_SENSITIVE": bool,
+    "LOG_LEVEL": str,
+    "LOG_JSON": bool,
+    "LOG_POLL_SAMPLE_RATE": int,
+    "METRICS_ENABLED": bool,
+    "METRICS_PORT": int,
+    "WATCHDOG_ENABLED": bool,
+    "WATCHDOG_THRESHOLD": (int, float),
+    "LOW_MEMORY_MODE": bool,
+    "AUTO_SHARD": bool,
+    "FEED_MODE": str,
+    "FEED_SOCKET": str,
+    "VERSION_SUFFIX": str,
+    "CONFIG_RELOAD_INTERVAL": (int, float),
+}
+
+# A rate limit is [uses, seconds], both positive numbers
+def _is_limit(limit):
+    return (isinstance(limit, list) and len(limit) == 2
+            and all(isinstance(n, (int, float)) and not isinstance(n, bool) and n > 0 for n in limit))
+
+# Returns a list of problems; an empty list means the config can be applied
+def validate_config(config):
+    if not isinstance(config, dict):
+        return ["config.yml must contain a mapping of settings"]
+
+    errors = []
+    for key, expected in CONFIG_TYPES.items():
+        value = config.get(key)
+        if value is None:
+            continue
+        # bool is a subclass of int, so don't let true/false pass as a number
+        if isinstance(value, bool) and expected is not bool:
+            errors.append(f"{key} must be a number or text, not {value}")
+        elif not isinstance(value, expected):
+            errors.append(f"{key} has the wrong type ({type(value).__name__})")
+
+    wait_time = config.get("WAIT_TIME")
+    if isinstance(wait_time, (int, float)) and not isinstance(wait_time, bool) and wait_time <= 0:
+        errors.append("WAIT_TIME must be positive")
+    rate_limits = config.get("PLAYERS_RATE_LIMITS")
+    for scope, limit in (rate_limits.items() if isinstance(rate_limits, dict) else ()):
+        if not _is_limit(limit):
+            errors.append(f"PLAYERS_RATE_LIMITS.{scope} must be [uses, seconds]")
+    notice_limit = config.get("PLAYERS_NOTICE_LIMIT")
+    if notice_limit is not None and not _is_limit(notice_limit):
+        errors.append("PLAYERS_NOTICE_LIMIT must be [uses, seconds]")
+    retention = config.get("ROLLUP_RETENTION")
+    tiers = [name for name, _, _ in TIERS]
+    for tier, window in (retention.items() if isinstance(retention, dict) else ()):
+        if tier not in tiers:
+            errors.append(f"ROLLUP_RETENTION.{tier} is not one of {', '.join(tiers)}")
+            continue
+        try:
+            if window:
+                parse_window(str(window))
+        except ValueError as e:
+            errors.append(f"ROLLUP_RETENTION.{tier}: {e}")
+    return errors
+
+# Polls config.yml's modification time and hands validated new configs to the on_change coroutine
+class ConfigWatcher:
+    def __init__(self, path, on_change, interval=5):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._mtime = self._stat()
+        self._task = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._stat() != self._mtime:
+                try:
+                    await self.reload()
+                except Exception as e:
+                    # Keep watching; the next save of config.yml gets another try
+                    logger.error(f"Error applying config.yml: {e}")
+
+    # Load, validate and apply config.yml; returns (applied, messages)
+    async def reload(self):
+        self._mtime = self._stat()
+        try:
+            with open(self.path, 'r') as f:
+                config = yaml.safe_load(f)
+        except Exception as e:
+            logger.error(f"Error reading {self.path}, keeping the current config: {e}")
+            return False, [str(e)]
+
+        errors = validate_config(config)
+        if errors:
+            for error in errors:
+                logger.error(f"Invalid config.yml, keeping the current config: {error}")
+            return False, errors
+
+        messages = await self.on_change(config) or []
+        logger.info("Reloaded config.yml.")
+        return True, messages
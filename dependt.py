@@ -1,5 +1,6 @@
 import subprocess
 import sys
+from importlib import metadata
 
 # List of essential libraries to install
 libraries = [
@@ -8,18 +9,26 @@ libraries = [
     'loguru',
     'discord.py',
     'matplotlib',
+    'numpy',
 ]
 
 def install(package):
     """Install a package using pip."""
     subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
 
+def is_installed(package):
+    """Check the installed package metadata without importing the package."""
+    try:
+        metadata.distribution(package)
+        return True
+    except metadata.PackageNotFoundError:
+        return False
+
 def main():
     for library in libraries:
-        try:
-            __import__(library.replace('-', '_'))  # Check if the package is installed
+        if is_installed(library):
             print(f"{library} is already installed.")
-        except ImportError:
+        else:
             print(f"{library} not found. Installing...")
             install(library)
             print(f"{library} installed successfully.")
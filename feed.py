@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import time
+from loguru import logger
+from models import ServerInfo, ModelError
+from poller import ServerResult, ServerTarget
+
+# Each frame is a 4-byte big-endian length followed by a JSON document
+FRAME_HEADER = struct.Struct('>I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# A subscriber this far behind is dropped rather than buffered forever
+MAX_BUFFERED = 4 * 1024 * 1024
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+# Where the feed socket goes when FEED_SOCKET is empty: the per-user runtime directory, or a
+# folder of this user's in the temp directory, never shared /tmp itself
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"scpsl-bot-{os.getuid()}")
+    return os.path.join(runtime_dir, "scpsl-feed.sock")
+
+def encode_results(results, fetched_at=None):
+    payload = {
+        "fetched_at": fetched_at if fetched_at is not None else time.time(),
+        "servers": {
+            result.name: (result.info.to_dict() if result.ok else {"Error": result.error})
+            for result in results
+        },
+    }
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(body)) + body
+
+# Turn a frame back into ServerResults, so subscribers run the same code as a bot that polled itself
+def decode_results(body):
+    payload = json.loads(body)
+    results = []
+    for name, entry in payload["servers"].items():
+        target = ServerTarget(None, None, name)
+        if "Error" in entry:
+            results.append(ServerResult(target, error=entry["Error"]))
+            continue
+        try:
+            results.append(ServerResult(target, ServerInfo.from_dict(entry)))
+        except ModelError as e:
+            results.append(ServerResult(target, error=f"Error parsing server data: {e}"))
+    return payload.get("fetched_at"), results
+
+# Serves every poll to the bots subscribed on a Unix socket; new subscribers get the latest poll at once
+class FeedPublisher:
+    def __init__(self, path):
+        self.path = path
+        self._server = None
+        self._writers = set()
+        self._handlers = set()
+        self._latest = None
+
+    async def start(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if os.stat(directory).st_mode & 0o022:
+            logger.warning(f"{directory} is writable by other users; point FEED_SOCKET at a private directory.")
+        if os.path.exists(self.path):
+            os.remove(self.path)  # left over from a previous run
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        # Only bots running as this user may subscribe
+        os.chmod(self.path, 0o600)
+        logger.info(f"Publishing polls on {self.path}.")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            # Closing a writer ends its handler's read, so this doesn't wait on subscribers
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @property
+    def subscribers(self):
+        return len(self._writers)
+
+    async def _handle(self, reader, writer):
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        logger.info(f"Feed subscriber connected ({len(self._writers)} total).")
+        if self._latest is not None:
+            writer.write(self._latest)
+        try:
+            # Subscribers never send anything; this returns when they disconnect
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+            logger.info(f"Feed subscriber disconnected ({len(self._writers)} left).")
+
+    # Encode once and queue the frame for every subscriber; never waits on a slow one
+    def publish(self, results):
+        self._latest = encode_results(results)
+        for writer in list(self._writers):
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                logger.warning("Dropping a feed subscriber that stopped reading.")
+                self._writers.discard(writer)
+                writer.close()
+                continue
+            writer.write(self._latest)
+
+# Reads polls from a FeedPublisher and hands them to on_results(results, fetched_at); reconnects on
+# its own. The publisher resends its latest poll on every reconnect, so polls already applied are skipped.
+class FeedSubscriber:
+    def __init__(self, path, on_results):
+        self.path = path
+        self.on_results = on_results
+        self.received = 0
+        self.last_fetched_at = None
+        self._connected = False
+        self._task = None
+
+    @property
+    def connected(self):
+        return self._connected
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        attempt = 0
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+                if attempt == 0:
+                    logger.warning(f"Can't reach the poll feed at {self.path}: {e}. Retrying every few seconds.")
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            attempt = 0
+            self._connected = True
+            logger.info(f"Subscribed to the poll feed at {self.path}.")
+            try:
+                await self._read(reader)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                logger.warning(f"Lost the poll feed at {self.path}: {e}")
+            finally:
+                self._connected = False
+                writer.close()
+
+    async def _read(self, reader):
+        while True:
+            (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            if size > MAX_FRAME_SIZE:
+                raise ConnectionError(f"frame of {size} bytes is too large")
+            body = await reader.readexactly(size)
+            try:
+                fetched_at, results = decode_results(body)
+            except (ValueError, KeyError, AttributeError) as e:
+                logger.error(f"Ignoring a malformed poll feed frame: {e}")
+                continue
+            if fetched_at is not None and self.last_fetched_at is not None and fetched_at <= self.last_fetched_at:
+                logger.debug("Skipping a poll from the feed that was already applied.")
+                continue
+            self.last_fetched_at = fetched_at
+            self.received += 1
+            try:
+                await self.on_results(results, fetched_at)
+            except Exception as e:
+                logger.error(f"Error handling a poll from the feed: {e}")
+
+# Poll-only process: `python feed.py` polls the API on WAIT_TIME and publishes to FEED_SOCKET,
+# for bots started with FEED_MODE: "subscribe"
+async def run_standalone():
+    import importlib.util
+    import yaml
+    from logs import setup_logging, LogSampler
+    from http_client import ApiClient
+    from poller import load_server_targets, poll_servers, aggregate_results
+    from scheduler import PollScheduler
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(directory, 'config.yml'), 'r') as f:
+        config = yaml.safe_load(f)
+    spec = importlib.util.spec_from_file_location("key", os.path.join(directory, 'key.py'))
+    key = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(key)
+
+    setup_logging(config.get("LOG_LEVEL", "INFO"), config.get("LOG_JSON", False))
+    targets = load_server_targets(config, {"SERVER_ID": key.SERVER_ID, "API_KEY": key.API_KEY})
+    max_concurrent_requests = config.get("MAX_CONCURRENT_REQUESTS", 10)
+    log_sampler = LogSampler(config.get("LOG_POLL_SAMPLE_RATE", 10))
+    publisher = FeedPublisher(config.get("FEED_SOCKET") or default_socket_path())
+
+    async def poll(session):
+        results = await poll_servers(session, targets, max_concurrent_requests, log_sampler)
+        publisher.publish(results)
+        total_players, total_slots, online = aggregate_results(results)
+        logger.bind(event="poll_summary", players=total_players, slots=total_slots, servers=online,
+                    subscribers=publisher.subscribers).info("Player count published")
+        return total_players, total_slots
+
+    async def create_session():
+        return ApiClient.from_config(config, max_concurrent_requests, config.get("WAIT_TIME", 60))
+
+    scheduler = PollScheduler(poll, create_session, config.get("WAIT_TIME", 60), config.get("POLL_JITTER", 1))
+    await publisher.start()
+    scheduler.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await scheduler.stop()
+        await publisher.stop()
+        await logger.complete()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_standalone())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,172 @@
+import mmap
+import os
+import re
+import struct
+import time
+from loguru import logger
+
+# File layout: a fixed header followed by a ring of fixed-size records
+HEADER = struct.Struct('<4sIIQQ')  # magic, format version, record size, capacity, samples written
+RECORD = struct.Struct('<dII')  # unix timestamp, players, slots
+MAGIC = b'SLHB'
+FORMAT_VERSION = 1
+DEFAULT_CAPACITY = 100_000
+
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+# Parse a window such as "90m", "24h" or "7d" into seconds
+def parse_window(text):
+    match = re.fullmatch(r"\s*(\d+)\s*([smhdw]?)\s*", text.lower())
+    if not match:
+        raise ValueError(f"Invalid window '{text}', use something like 30m, 24h or 7d")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2) or "h"]
+
+# Summary of the samples inside a window
+class HistoryStats:
+    __slots__ = ("samples", "first", "last", "min_players", "max_players", "mean_players", "peak_time", "slots")
+
+    def __init__(self):
+        self.samples = 0
+        self.first = self.last = None
+        self.min_players = self.max_players = 0
+        self.mean_players = 0.0
+        self.peak_time = None
+        self.slots = 0
+
+# Player-count time series stored in a memory-mapped ring buffer; the file never grows past capacity
+class PlayerHistory:
+    def __init__(self, filename, capacity=DEFAULT_CAPACITY):
+        self.filename = filename
+        self.capacity = capacity
+        self._file = None
+        self._mm = None
+        self._open()
+
+    def _open(self):
+        size = HEADER.size + RECORD.size * self.capacity
+        exists = os.path.isfile(self.filename)
+        if exists:
+            self._resize_if_needed()
+        self._file = open(self.filename, 'r+b' if exists else 'w+b')
+        if not exists or os.path.getsize(self.filename) != size or not self._header_valid():
+            if exists:
+                logger.warning(f"History file '{self.filename}' has a different layout, starting a new one.")
+            self._file.seek(0)
+            self._file.truncate(size)
+            self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, self.capacity, 0))
+            self._file.flush()
+        self._mm = mmap.mmap(self._file.fileno(), size)
+
+    # HISTORY_CAPACITY changed: copy the newest samples that fit into a file of the new size, in order
+    def _resize_if_needed(self):
+        with open(self.filename, 'rb') as f:
+            raw = f.read(HEADER.size)
+            if len(raw) != HEADER.size:
+                return
+            magic, version, record_size, capacity, written = HEADER.unpack(raw)
+            if (magic, version, record_size) != (MAGIC, FORMAT_VERSION, RECORD.size) or capacity == self.capacity:
+                return
+            if capacity == 0 or os.path.getsize(self.filename) != HEADER.size + RECORD.size * capacity:
+                return
+            ring = f.read(RECORD.size * capacity)
+
+        count = min(written, capacity, self.capacity)
+        # The newest count records end just before position written % capacity
+        start = (written - count) % capacity
+        records = (ring + ring)[RECORD.size * start:RECORD.size * (start + count)]
+        temp_name = self.filename + '.tmp'
+        with open(temp_name, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, self.capacity, count))
+            f.write(records)
+            f.truncate(HEADER.size + RECORD.size * self.capacity)
+        os.replace(temp_name, self.filename)
+        logger.info(f"Resized history file '{self.filename}' from {capacity:,} to {self.capacity:,} samples, "
+                    f"kept the newest {count:,}.")
+
+    def _header_valid(self):
+        self._file.seek(0)
+        raw = self._file.read(HEADER.size)
+        if len(raw) != HEADER.size:
+            return False
+        magic, version, record_size, capacity, _ = HEADER.unpack(raw)
+        return (magic, version, record_size, capacity) == (MAGIC, FORMAT_VERSION, RECORD.size, self.capacity)
+
+    @property
+    def written(self):
+        return HEADER.unpack_from(self._mm, 0)[4]
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def append(self, players, slots, timestamp=None):
+        written = self.written
+        offset = HEADER.size + RECORD.size * (written % self.capacity)
+        RECORD.pack_into(self._mm, offset, timestamp if timestamp is not None else time.time(), players, slots)
+        HEADER.pack_into(self._mm, 0, MAGIC, FORMAT_VERSION, RECORD.size, self.capacity, written + 1)
+
+    # Record at logical position i, 0 being the oldest sample still kept
+    def _record(self, i):
+        start = self.written - len(self)
+        return RECORD.unpack_from(self._mm, HEADER.size + RECORD.size * ((start + i) % self.capacity))
+
+    # Logical position of the first sample at or after timestamp (samples are appended in time order)
+    def _bisect(self, timestamp):
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # Stream the raw records between two logical positions without copying the ring
+    def _iter_range(self, lo, hi):
+        start = self.written - len(self)
+        view = memoryview(self._mm)
+        try:
+            while lo < hi:
+                physical = (start + lo) % self.capacity
+                count = min(hi - lo, self.capacity - physical)
+                offset = HEADER.size + RECORD.size * physical
+                yield from RECORD.iter_unpack(view[offset:offset + RECORD.size * count])
+                lo += count
+        finally:
+            view.release()
+
+    def iter_since(self, since):
+        return self._iter_range(self._bisect(since), len(self))
+
+    def stats(self, window_seconds, now=None):
+        since = (now if now is not None else time.time()) - window_seconds
+        result = HistoryStats()
+        total = 0
+        for timestamp, players, slots in self.iter_since(since):
+            if result.samples == 0:
+                result.first = timestamp
+                result.min_players = result.max_players = players
+                result.peak_time = timestamp
+            elif players < result.min_players:
+                result.min_players = players
+            elif players > result.max_players:
+                result.max_players = players
+                result.peak_time = timestamp
+            result.samples += 1
+            result.last = timestamp
+            result.slots = slots
+            total += players
+        if result.samples:
+            result.mean_players = total / result.samples
+        return result
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+import aiohttp
+from loguru import logger
+import metrics
+
+# Statuses worth retrying: the API is overloaded or briefly unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+# Raised instead of making a request while the circuit breaker is open
+class CircuitOpenError(Exception):
+    pass
+
+# The API kept answering with a retryable status until the retries ran out
+class HttpStatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+# Stops calls to an upstream that keeps failing, then lets a single probe through to test recovery.
+# Every failed probe doubles the wait before the next one, up to max_reset_timeout.
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+    STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, max_reset_timeout=600):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max(reset_timeout, max_reset_timeout)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def _set_state(self, state):
+        self.state = state
+        metrics.BREAKER_STATE.set(self.STATE_VALUES[state])
+
+    # Seconds until the next probe is allowed; 0 when calls may go ahead
+    def retry_in(self):
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.retry_in() == 0:
+            self._set_state(self.HALF_OPEN)
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            logger.info("Probing the SCP:SL API after repeated failures.")
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("SCP:SL API recovered, resuming normal polling.")
+            self._set_state(self.CLOSED)
+        self.failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self._probing = False
+
+    # The probe ended without an answer either way (it was cancelled); let the next call probe instead
+    def release_probe(self):
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+        elif self.state == self.OPEN or self.failures < self.failure_threshold:
+            return
+        self._set_state(self.OPEN)
+        self.opened_at = time.monotonic()
+        self._probing = False
+        logger.warning(f"SCP:SL API is failing, pausing requests for {self.reset_timeout:g}s.")
+
+# HTTP client for the SCP:SL API: bounded timeouts, a keep-alive connection pool with cached DNS,
+# jittered retries for transient failures, and a circuit breaker shared by every request
+class ApiClient:
+    def __init__(self, max_connections=10, connect_timeout=5, read_timeout=10, retries=2,
+                 backoff_base=0.5, backoff_max=5, breaker=None, keepalive_timeout=75):
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=connect_timeout + read_timeout,
+                                             sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    @classmethod
+    def from_config(cls, config, max_connections=10, poll_interval=60):
+        breaker = CircuitBreaker(config.get("BREAKER_THRESHOLD", 5), config.get("BREAKER_RESET_TIMEOUT", 30))
+        return cls(
+            max_connections,
+            connect_timeout=config.get("API_CONNECT_TIMEOUT", 5),
+            read_timeout=config.get("API_READ_TIMEOUT", 10),
+            retries=config.get("API_RETRIES", 2),
+            breaker=breaker,
+            # Keep connections open across polls so each poll doesn't pay for a new TLS handshake
+            keepalive_timeout=max(75, poll_interval + 15),
+        )
+
+    @property
+    def closed(self):
+        return self._session is None or self._session.closed
+
+    def _get_session(self):
+        if self.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                ttl_dns_cache=300,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: spread retries from every server out instead of firing them together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    # GET url; returns (status, content type, body bytes). Raises CircuitOpenError while the breaker
+    # is open, or the last error once the retries are used up.
+    async def get(self, url, params=None):
+        session = self._get_session()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"API paused for another {self.breaker.retry_in():.0f}s after repeated failures")
+
+            retry_after = None
+            try:
+                async with session.get(url, params=params) as response:
+                    body = await response.read()
+                    if response.status not in RETRY_STATUSES:
+                        self.breaker.record_success()
+                        return response.status, response.headers.get('Content-Type', ''), body
+                    error = HttpStatusError(response.status)
+                    header = response.headers.get('Retry-After', '')
+                    retry_after = float(header) if header.isdigit() else None
+            except RETRY_EXCEPTIONS as e:
+                error = e
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception:
+                # Not worth retrying, but it still counts against the API
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_failure()
+
+            if attempt >= self.retries or self.breaker.state != CircuitBreaker.CLOSED:
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            attempt += 1
+            metrics.API_RETRIES.inc()
+            logger.debug(f"Retrying {url} in {delay:.2f}s after {error!r} (attempt {attempt} of {self.retries}).")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import time
+import discord
+from loguru import logger
+from models import ServerInfo
+from snapshot import write_json_atomic
+
+# Discord allows about 5 edits per 5 seconds per channel; staying far below leaves room for commands
+DEFAULT_MIN_INTERVAL = 30
+
+def status_state(snapshot):
+    servers = tuple((name, server.count if isinstance(server, ServerInfo) else server)
+                    for name, server in snapshot.servers.items())
+    return snapshot.players, snapshot.slots, snapshot.online, servers
+
+def build_status_embed(state):
+    players, slots, online, servers = state
+    embed = discord.Embed(
+        title="Live Server Status",
+        description=f"**{players:,} / {slots:,}** players online" if online else "Player count unavailable, retrying",
+        color=discord.Color.green() if online else discord.Color.red(),
+        timestamp=discord.utils.utcnow(),
+    )
+    if len(servers) > 1:
+        embed.add_field(name="Servers", value="\n".join(f"**{name}**: {count}" for name, count in servers), inline=False)
+    embed.set_footer(text="Edited when the count changes · last change")
+    return embed
+
+# One pinned message per configured channel, edited in place by the poll loop instead of uploading
+# an image per request. Edits only go out when the snapshot changes, at most one per min_interval,
+# always with the newest state, and are retried in channels where they failed; message ids are
+# saved so restarts keep editing the same messages.
+class LiveStatusBoard:
+    def __init__(self, client, channel_ids, filename, min_interval=DEFAULT_MIN_INTERVAL, pin=True):
+        self.client = client
+        self.channel_ids = [int(channel_id) for channel_id in channel_ids or ()]
+        self.filename = filename
+        self.min_interval = min_interval
+        self.pin = pin
+        self.edits = 0
+        self._message_ids = {}  # channel id -> message id
+        self._channel_states = {}  # channel id -> state its message last showed successfully
+        self._last_sent_at = float('-inf')
+        self._pending = None
+        self._flush_task = None
+        self._load()
+
+    @property
+    def enabled(self):
+        return bool(self.channel_ids)
+
+    def _load(self):
+        if not self.filename or not os.path.isfile(self.filename):
+            return
+        try:
+            with open(self.filename, 'r') as f:
+                self._message_ids = {int(channel_id): int(message_id) for channel_id, message_id in json.load(f).items()}
+        except Exception as e:
+            logger.error(f"Error reading from '{self.filename}': {e}")
+
+    def _save(self, message_ids):
+        try:
+            write_json_atomic(json.dumps(message_ids).encode('utf-8'), self.filename)
+        except Exception as e:
+            logger.error(f"Error writing to '{self.filename}': {e}")
+
+    # The live message in a channel, for pointing !players at it
+    def message_in(self, channel):
+        message_id = self._message_ids.get(channel.id)
+        if message_id is None or channel.id not in self.channel_ids:
+            return None
+        return channel.get_partial_message(message_id)
+
+    def _stale_channels(self, state):
+        return [channel_id for channel_id in self.channel_ids if self._channel_states.get(channel_id) != state]
+
+    def update(self, snapshot):
+        if not self.enabled:
+            return
+        state = status_state(snapshot)
+        flushing = self._flush_task is not None and not self._flush_task.done()
+        if not flushing and not self._stale_channels(state):
+            self._pending = None
+            return
+        # Always the newest state, so a change that reverts before the edit goes out isn't sent
+        self._pending = state
+        if flushing:
+            return  # the scheduled edit picks up the newest state
+        wait = max(0.0, self._last_sent_at + self.min_interval - time.monotonic())
+        self._flush_task = asyncio.ensure_future(self._flush_later(wait))
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        state, self._pending = self._pending, None
+        channel_ids = self._stale_channels(state) if state is not None else []
+        if not channel_ids:
+            return
+        self._last_sent_at = time.monotonic()
+        embed = build_status_embed(state)
+        results = await asyncio.gather(*(self._publish(channel_id, embed) for channel_id in channel_ids))
+        failed = False
+        for channel_id, (ok, _) in zip(channel_ids, results):
+            if ok:
+                self._channel_states[channel_id] = state
+            elif channel_id in self.channel_ids:
+                failed = True
+        if any(posted for _, posted in results):
+            await asyncio.get_running_loop().run_in_executor(None, self._save, dict(self._message_ids))
+
+        # A newer state arrived while editing, or some channels failed and get retried;
+        # either way it goes out once the interval has passed
+        if self._pending is None and failed:
+            self._pending = state
+        if self._pending is not None:
+            self._flush_task = asyncio.ensure_future(self._flush_later(self.min_interval))
+
+    async def _channel(self, channel_id):
+        channel = self.client.get_channel(channel_id)
+        if channel is None:
+            channel = await self.client.fetch_channel(channel_id)
+        return channel
+
+    # Edit the channel's message, or post (and pin) a new one; returns (succeeded, posted a new message)
+    async def _publish(self, channel_id, embed):
+        try:
+            channel = await self._channel(channel_id)
+            message_id = self._message_ids.get(channel_id)
+            if message_id is not None:
+                try:
+                    await channel.get_partial_message(message_id).edit(embed=embed)
+                    self.edits += 1
+                    return True, False
+                except discord.NotFound:
+                    logger.info(f"Live status message in channel {channel_id} was deleted, posting a new one.")
+
+            message = await channel.send(embed=embed)
+            self._message_ids[channel_id] = message.id
+            if self.pin:
+                try:
+                    await message.pin()
+                except discord.Forbidden:
+                    logger.warning(f"Can't pin the live status message in channel {channel_id}: missing Manage Messages.")
+            return True, True
+        except (discord.NotFound, discord.Forbidden) as e:
+            # Retrying won't help until the channel or the permissions are fixed
+            self.channel_ids.remove(channel_id)
+            logger.warning(f"Stopped updating the live status in channel {channel_id} until the bot restarts: {e}")
+            return False, False
+        except Exception as e:
+            logger.error(f"Error updating the live status in channel {channel_id}: {e}")
+            return False, False
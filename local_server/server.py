@@ -13,17 +13,22 @@ $ ./server.py
 
 import argparse
 import json
+import math
 import os
+import random
 import sys
 import time
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
 
 
 class Configuration:
-    def __init__(self, hostname, port, responses):
+    def __init__(self, hostname, port, responses, quiet=False):
         self.hostname = hostname
         self.port = port
+        self.quiet = quiet
         self.get_response_map = {}
         self.post_response_map = {}
         self.put_response_map = {}
@@ -39,17 +44,39 @@ class Configuration:
         }
 
         for response in responses:
+            path, _, query = response.get("path", "/").partition("?")
+            params = dict(parse_qsl(query))
+            params.update(response.get("query") or {})
+
             mocked_resp = MokedResponse(
                 response.get("method"),
-                response.get("path"),
+                path,
                 response.get("responseCode"),
                 response.get("headers"),
                 response.get("body"),
                 response.get("delay"),
+                params,
+                response.get("generator"),
+                response.get("errorRate"),
+                response.get("errorCode"),
             )
 
             method_map = response_map[response.get("method").upper()]
-            method_map[response.get("path")] = mocked_resp
+            method_map.setdefault(path, []).append(mocked_resp)
+
+        # The response asking for the most query parameters wins
+        for method_map in response_map.values():
+            for candidates in method_map.values():
+                candidates.sort(key=lambda resp: len(resp.query), reverse=True)
+
+    def find(self, method, raw_path):
+        parsed = urlsplit(raw_path)
+        params = dict(parse_qsl(parsed.query))
+        method_map = getattr(self, "%s_response_map" % method.lower())
+        for response in method_map.get(parsed.path, ()):
+            if response.matches(params):
+                return response, params
+        return None, params
 
 
 class MokedResponse:
@@ -61,28 +88,51 @@ class MokedResponse:
         headers=None,
         body=None,
         delay=None,
+        query=None,
+        generator=None,
+        error_rate=None,
+        error_code=None,
     ):
         self.method = method if method else "GET"
         self.path = path if path else "/"
         self.response_code = response_code or 200
         self.headers = headers or []
         self.delay = delay or 0
-        self.body = self.MokedResponseBody(body)
+        self.query = query or {}
+        self.error_rate = error_rate or 0
+        self.error_code = error_code or 500
+        self.body = (
+            ScpSlGenerator(**generator) if generator else self.MokedResponseBody(body)
+        )
+
+    def matches(self, params):
+        return all(params.get(key) == str(value) for key, value in self.query.items())
+
+    # A fixed delay, or a random one between [min, max]
+    def pick_delay(self):
+        if isinstance(self.delay, (list, tuple)):
+            return random.uniform(*self.delay)
+        return self.delay
+
+    def should_fail(self):
+        return self.error_rate and random.random() < self.error_rate
 
     def __repr__(self):
         return self.__str__()
 
     def __str__(self):
         return (
-            "method = [%s], path = [%s], response_code = [%s], "
-            "headers = [%s], body = [%s], delay = [%s]"
+            "method = [%s], path = [%s], query = [%s], response_code = [%s], "
+            "headers = [%s], body = [%s], delay = [%s], error_rate = [%s]"
             % (
                 self.method,
                 self.path,
+                self.query,
                 self.response_code,
                 self.headers,
                 self.body,
                 self.delay,
+                self.error_rate,
             )
         )
 
@@ -90,30 +140,26 @@ class MokedResponse:
         def __init__(self, content=None):
             self._file_definition = "@file://"
             self.content = content if content else ""
-            self.is_file = self._file_definition in content
+            self.is_file = self._file_definition in self.content
+            self._data = self._read()
 
-        def load(self):
+        # Bodies are read once, when the configuration is loaded
+        def _read(self):
             if self.is_file:
                 filename = self.content.replace(self._file_definition, "")
                 try:
-                    with open(filename) as file:
+                    with open(filename, "rb") as file:
                         return file.read()
-                except:
-                    print >> sys.stderr, (
-                        "File '%s' not found in filesystem." % filename
-                    )
-                    return None
-            else:
-                return self.content.encode('utf-8')
+                except OSError:
+                    print("File '%s' not found in filesystem." % filename, file=sys.stderr)
+                    return b""
+            return self.content.encode("utf-8")
 
-        def __len__(self):
-            try:
-                filename = self.content.replace(self._file_definition, "")
-                length = os.stat(filename).st_size
-            except:
-                length = len("None")
+        def load(self, params=None):
+            return self._data
 
-            return length if self.is_file else len(self.content)
+        def __len__(self):
+            return len(self._data)
 
         def __str__(self):
             return "is_file = [%s], content = [%s]" % (
@@ -122,52 +168,129 @@ class MokedResponse:
             )
 
 
+class ScpSlGenerator:
+    """
+    Generated serverinfo.php responses for many server ids. Each server's
+    player count follows its own wave over `period` seconds, so the data
+    changes over time like a real server list.
+    """
+
+    def __init__(self, type="scpsl", servers=1, slots=30, period=600, cooldown=11):
+        if type != "scpsl":
+            raise ValueError("Unknown generator type '%s'" % type)
+        self.servers = servers
+        self.slots = slots
+        self.period = period
+        self.cooldown = cooldown
+
+    def players_at(self, server_id, now):
+        phase = now / self.period + server_id * 0.137
+        return int(round((math.sin(2 * math.pi * phase) + 1) / 2 * self.slots))
+
+    def load(self, params=None):
+        params = params or {}
+        try:
+            server_id = int(params.get("id", ""))
+        except ValueError:
+            server_id = 0
+        if not 1 <= server_id <= self.servers:
+            return _error_body("Invalid server id")
+        players = self.players_at(server_id, time.time())
+        return self._render(server_id, players, params.get("players") == "true")
+
+    @lru_cache(maxsize=4096)
+    def _render(self, server_id, players, with_players):
+        server = {
+            "ID": server_id,
+            "Port": 7777,
+            "Online": True,
+            "Players": "%d/%d" % (players, self.slots),
+        }
+        if with_players:
+            server["PlayersList"] = [
+                {"ID": "%d%05d@steam" % (server_id, n), "Nickname": "Player%d" % n}
+                for n in range(players)
+            ]
+        body = {"Success": True, "Cooldown": self.cooldown, "Servers": [server]}
+        return json.dumps(body).encode("utf-8")
+
+    def __str__(self):
+        return "generator = [scpsl], servers = [%s], slots = [%s], period = [%s]" % (
+            self.servers,
+            self.slots,
+            self.period,
+        )
+
+
+def _error_body(message):
+    return json.dumps({"Success": False, "Error": message}).encode("utf-8")
+
+
 def SimpleHandlerFactory(configuration):
     class SimpleHandler(BaseHTTPRequestHandler):
-        response_map = {
-            "GET": configuration.get_response_map.get,
-            "POST": configuration.post_response_map.get,
-            "PUT": configuration.put_response_map.get,
-            "DELETE": configuration.delete_response_map.get,
-        }
+        # Keep-alive, so clients can reuse pooled connections; headers and body
+        # go out as separate writes, so Nagle would add a delayed-ACK stall to each
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            if not configuration.quiet:
+                BaseHTTPRequestHandler.log_message(self, format, *args)
 
         def do_HEAD(self):
             self.send_response(200)
             self.send_header("Content-type", "text/html")
+            self.send_header("Content-length", "0")
             self.end_headers()
 
         def do_GET(self):
-            response = self.retrive_response(self.path, "GET")
-            self.send(self.path, response)
+            self.send(*self.retrive_response(self.path, "GET"))
 
         def do_POST(self):
-            response = self.retrive_response(self.path, "POST")
-            self.send(self.path, response)
+            self._discard_request_body()
+            self.send(*self.retrive_response(self.path, "POST"))
 
         def do_DELETE(self):
-            response = self.retrive_response(self.path, "DELETE")
-            self.send(self.path, response)
+            self.send(*self.retrive_response(self.path, "DELETE"))
 
         def do_PUT(self):
-            response = self.retrive_response(self.path, "PUT")
-            self.send(self.path, response)
-
-        def send(self, path, response):
-            time.sleep(response.delay)
+            self._discard_request_body()
+            self.send(*self.retrive_response(self.path, "PUT"))
+
+        def _discard_request_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+        def send(self, response, params):
+            # Only this connection's thread waits
+            delay = response.pick_delay()
+            if delay:
+                time.sleep(delay)
+
+            if response.should_fail():
+                response_code = response.error_code
+                headers = [{"Content-Type": "application/json"}]
+                body = _error_body("Injected error")
+            else:
+                response_code = response.response_code
+                headers = response.headers
+                body = response.body.load(params)
 
-            self.send_response(response.response_code)
+            self.send_response(response_code)
 
-            for header in response.headers:
+            for header in headers:
                 keys = list(header.keys())
                 values = list(header.values())
                 self.send_header(keys[0], values[0])
-            self.send_header("Content-length", str(len(response.body)))
+            self.send_header("Content-length", str(len(body)))
             self.end_headers()
-            self.wfile.write(response.body.load())
+            self.wfile.write(body)
 
         def retrive_response(self, path, method):
+            params = {}
             try:
-                response = self.response_map.get(method)(path)
+                response, params = configuration.find(method, path)
 
                 if response is None:
                     body = '{ "message": "path \'%s\' not found" }' % path
@@ -182,12 +305,12 @@ def SimpleHandlerFactory(configuration):
                 headers = [{"Content-Type": "Application/JSON"}]
                 response = MokedResponse(method, path, 500, headers, body)
 
-            return response
+            return response, params
 
     return SimpleHandler
 
 
-def load_configuration(config_file=None):
+def load_configuration(config_file=None, quiet=False):
     default_host = os.environ.get("HOST", "0.0.0.0")
     default_port = int(os.environ.get("PORT", "8000"))
     default_responses = []
@@ -210,14 +333,21 @@ def load_configuration(config_file=None):
         json_config.get("hostname", default_host),
         json_config.get("port", default_port),
         json_config.get("responses", default_responses),
+        quiet or json_config.get("quiet", False),
     )
 
 
     return configuration
 
 
+class MockServer(ThreadingHTTPServer):
+    # Every connection gets its own thread, so slow responses don't hold up other clients
+    daemon_threads = True
+    request_queue_size = 1024
+
+
 def main(config):
-    httpd = HTTPServer(
+    httpd = MockServer(
         (config.hostname, config.port), SimpleHandlerFactory(config)
     )
 
@@ -252,11 +382,17 @@ def get_opts():
         help="Use custom JSON configuration file.",
         required=False,
     )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Don't log every request.",
+    )
 
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = get_opts()
-    config = load_configuration(args.file)
+    config = load_configuration(args.file, args.quiet)
     main(config)
\ No newline at end of file
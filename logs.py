@@ -0,0 +1,36 @@
+import sys
+from loguru import logger
+
+BODY_PREVIEW_LIMIT = 200
+
+# Render bound fields as key=value pairs after the message
+def _format_record(record):
+    fields = " ".join(f"{key}={{extra[{key}]}}" for key in record["extra"])
+    return "{time} {level} {message}" + (" " + fields if fields else "") + "\n{exception}"
+
+# Replace loguru's default stderr sink with a single queued stdout sink, so writes happen off the event loop
+def setup_logging(level="INFO", json_logs=False):
+    logger.remove()
+    if json_logs:
+        logger.add(sys.stdout, level=level, serialize=True, enqueue=True)
+    else:
+        logger.add(sys.stdout, format=_format_record, level=level, enqueue=True)
+
+# Shorten a response body for log records that are not at DEBUG level
+def truncate(text, limit=BODY_PREVIEW_LIMIT):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text) - limit} more chars)"
+
+# Lets through one in every `rate` calls; a rate of 1 or less lets everything through
+class LogSampler:
+    def __init__(self, rate=1):
+        self.rate = max(1, int(rate))
+        self._count = 0
+
+    def __call__(self):
+        self._count += 1
+        if self._count >= self.rate:
+            self._count = 0
+            return True
+        return False
@@ -0,0 +1,223 @@
+import asyncio
+import heapq
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from loguru import logger
+
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_SLOW_CALLBACK = 0.05
+DEFAULT_TOP_N = 20
+DUMP_FILE = 'perf_dump.txt'
+
+# One time the loop was blocked past the threshold, with the stack that was running when it was caught
+class Stall:
+    __slots__ = ("started_at", "duration", "stack")
+
+    def __init__(self, started_at, stack):
+        self.started_at = started_at
+        self.duration = 0.0
+        self.stack = stack
+
+    def __lt__(self, other):
+        return self.duration < other.duration
+
+    @property
+    def where(self):
+        return self.stack[-1].strip().splitlines()[0] if self.stack else "unknown"
+
+# Name the code behind an asyncio handle: the coroutine for task steps, the function otherwise
+def describe_callback(handle):
+    callback = getattr(handle, "_callback", None)
+    owner = getattr(callback, "__self__", None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        return getattr(coro, "__qualname__", repr(coro))
+    return getattr(callback, "__qualname__", repr(callback))
+
+def _loop_stack(thread_id):
+    frame = sys._current_frames().get(thread_id)
+    return traceback.format_stack(frame) if frame is not None else []
+
+# Opt-in watchdog for the event loop. A heartbeat task runs on the loop and a thread watches it; when
+# the heartbeat is late by more than threshold, the thread grabs the loop thread's stack, so the
+# blocking code is caught in the act. While running, every loop callback is timed and the slowest
+# are kept, which names the culprit even for stalls too short to catch.
+class LoopWatchdog:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, slow_callback=DEFAULT_SLOW_CALLBACK, top_n=DEFAULT_TOP_N):
+        self.threshold = threshold
+        self.slow_callback = slow_callback
+        self.top_n = top_n
+        self.interval = min(0.1, threshold / 2)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stall_count = 0
+        self.slow_stalls = []  # min-heap of the top_n longest Stalls
+        self.slow_callbacks = []  # min-heap of the top_n slowest (seconds, name, when)
+        self._beat = time.monotonic()
+        self._current = None
+        self._lock = threading.Lock()
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._original_run = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        self._patch_handles()
+        logger.info(f"Event loop watchdog started, reporting stalls over {self.threshold * 1000:.0f} ms.")
+
+    def stop(self):
+        self._unpatch_handles()
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            with self._lock:
+                self._beat = now
+                stall, self._current = self._current, None
+            if stall is not None:
+                stall.duration = lag
+                self.stall_count += 1
+                self._keep(self.slow_stalls, stall)
+                logger.bind(event="loop_stall", lag_ms=round(lag * 1000)).warning("Event loop blocked at {}", stall.where)
+
+    # Runs in its own thread, so it keeps going while the loop is stuck
+    def _watch(self):
+        while not self._stop.wait(self.interval / 2):
+            with self._lock:
+                late = time.monotonic() - self._beat - self.interval
+                if late < self.threshold or self._current is not None:
+                    continue
+                self._current = Stall(time.time() - late, _loop_stack(self._loop_thread))
+
+    def _keep(self, heap, item):
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif heap[0] < item:
+            heapq.heapreplace(heap, item)
+
+    def _patch_handles(self):
+        if self._original_run is not None:
+            return
+        original_run = self._original_run = asyncio.events.Handle._run
+        watchdog = self
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            original_run(handle)
+            elapsed = time.perf_counter() - started
+            if elapsed >= watchdog.slow_callback:
+                watchdog._keep(watchdog.slow_callbacks, (elapsed, describe_callback(handle), time.time()))
+
+        asyncio.events.Handle._run = timed_run
+
+    def _unpatch_handles(self):
+        if self._original_run is not None:
+            asyncio.events.Handle._run = self._original_run
+            self._original_run = None
+
+    def top_stalls(self):
+        return sorted(self.slow_stalls, reverse=True)
+
+    def top_callbacks(self):
+        return sorted(self.slow_callbacks, reverse=True)
+
+    # Full report with every recorded stack, for the dump file
+    def dump(self, filename=DUMP_FILE):
+        lines = [
+            f"Event loop report, {time.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Stalls over {self.threshold * 1000:.0f} ms: {self.stall_count}, worst lag {self.max_lag * 1000:.0f} ms",
+            "",
+            f"Slowest callbacks (over {self.slow_callback * 1000:.0f} ms):",
+        ]
+        for elapsed, name, at in self.top_callbacks():
+            lines.append(f"  {elapsed * 1000:8.1f} ms  {time.strftime('%H:%M:%S', time.localtime(at))}  {name}")
+        for stall in self.top_stalls():
+            lines += ["", f"Stall of {stall.duration * 1000:.0f} ms at {time.strftime('%H:%M:%S', time.localtime(stall.started_at))}:"]
+            lines += [line.rstrip() for line in stall.stack]
+        with open(filename, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        return filename
+
+# Statistical profiler for production: a thread samples the loop thread's stack every interval
+# and counts what it sees, so it costs nothing until started and little while running
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = 0
+        self.started_at = None
+        self._stacks = Counter()
+        self._thread = None
+        self._stop = threading.Event()
+        self._target = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._target = threading.get_ident()
+        self._stacks.clear()
+        self.samples = 0
+        self.started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    # The functions seen on top of the stack most often, as (share of samples, function)
+    def top_functions(self, limit=15):
+        counts = Counter()
+        for stack, count in self._stacks.items():
+            counts[stack.rsplit(";", 1)[-1]] += count
+        total = max(1, self.samples)
+        return [(count / total, name) for name, count in counts.most_common(limit)]
+
+    # Write the samples in the folded format flame graph tools read
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return filename
@@ -1,24 +1,49 @@
-import os
 import sys
+from startup import StartupProfiler
+
+# Created before anything heavy is imported, so --startup-profile sees every import
+profiler = StartupProfiler('--startup-profile' in sys.argv)
+
+import os
 import asyncio
 import discord
 from discord.ext import commands
-import aiohttp
 import json
 from loguru import logger
-import matplotlib.pyplot as plt
 import io
 import time
 import importlib.util
 import yaml
 
-# Import the update checker
-from updater import check_for_updates
+from snapshot import Snapshot, SnapshotStore
+from models import ServerInfo, JSON_DECODER
+from history import PlayerHistory, parse_window
+from sessions import PlayerSessions
+from rollups import RollupStore
+from render import PlayerCountRenderer
+from presence import PresenceManager
+from blacklist import BlacklistMatcher
+from ratelimit import RateLimiter, SingleFlight
+from scheduler import PollScheduler, AdaptiveInterval
+from config_watcher import ConfigWatcher
+from feed import FeedPublisher, FeedSubscriber, default_socket_path
+from loopwatch import LoopWatchdog, SamplingProfiler
+from livestatus import LiveStatusBoard
+from logs import setup_logging, LogSampler, truncate
+from metrics import MetricsServer, COMMAND_LATENCY, BLACKLIST_DROPS
+from poller import load_server_targets, poll_servers, aggregate_results, group_targets
+from http_client import ApiClient
 
 # Constants
-last_query_time = 0
-QUERY_INTERVAL = 5
 DATA_FILE = 'player_data.json'
+HISTORY_FILE = 'player_history.bin'
+SESSIONS_FILE = 'player_sessions.json'
+ROLLUP_FILE = 'player_history.db'
+PERF_DUMP_FILE = 'perf_dump.txt'
+PROFILE_FILE = 'profile.folded'
+LIVE_STATUS_FILE = 'live_status.json'
+
+profiler.mark("imports")
 
 # Load sensitive information from key.py
 def load_sensitive_info():
@@ -33,6 +58,7 @@ def load_sensitive_info():
     }
 
 sensitive_info = load_sensitive_info()
+profiler.mark("load key.py")
 
 # Load configuration from config.yml
 def load_config():
@@ -44,140 +70,284 @@ def load_config():
         return yaml.safe_load(f)  # Use yaml to load the config
 
 config = load_config()
+profiler.mark("load config.yml")
 
 # Fetch sensitive data
-ID = sensitive_info["SERVER_ID"]
-API_KEY = sensitive_info["API_KEY"]
 BOT_TOKEN = sensitive_info["BOT_TOKEN"]
 
-# Configurable settings
-WAIT_TIME = config.get("WAIT_TIME", 60)
-ENABLE_STATUS = config.get("ENABLE_STATUS", True)
-SERVER_INDEX = config.get("SERVER_INDEX", 0)
-BLACKLIST = config.get("BLACKLIST", [])
+# Configurable settings that config reloads apply while the bot runs
+def read_live_settings(config):
+    global WAIT_TIME, POLL_JITTER, ADAPTIVE_POLLING, ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL, REQUEST_BUDGET_PER_HOUR
+    global ENABLE_STATUS, SERVERS, RENDER_THEME, PLAYERS_RATE_LIMITS, PLAYERS_NOTICE_LIMIT, PRESENCE_MIN_INTERVAL
+    global LOG_POLL_SAMPLE_RATE
+    WAIT_TIME = config.get("WAIT_TIME", 60)
+    POLL_JITTER = config.get("POLL_JITTER", 1)
+    ADAPTIVE_POLLING = config.get("ADAPTIVE_POLLING", False)
+    ADAPTIVE_MIN_INTERVAL = config.get("ADAPTIVE_MIN_INTERVAL", 15)
+    ADAPTIVE_MAX_INTERVAL = config.get("ADAPTIVE_MAX_INTERVAL", 600)
+    REQUEST_BUDGET_PER_HOUR = config.get("REQUEST_BUDGET_PER_HOUR", 240)
+    ENABLE_STATUS = config.get("ENABLE_STATUS", True)
+    SERVERS = load_server_targets(config, sensitive_info)
+    RENDER_THEME = config.get("RENDER_THEME", "dark")
+    PLAYERS_RATE_LIMITS = config.get("PLAYERS_RATE_LIMITS", {"user": [2, 10], "channel": [3, 10], "guild": [6, 10]})
+    PLAYERS_NOTICE_LIMIT = config.get("PLAYERS_NOTICE_LIMIT", [3, 30])
+    PRESENCE_MIN_INTERVAL = config.get("PRESENCE_MIN_INTERVAL", 12)
+    LOG_POLL_SAMPLE_RATE = config.get("LOG_POLL_SAMPLE_RATE", 10)
+
+read_live_settings(config)
+
+# Blacklisted words, compiled once into a single pattern
+blacklist_matcher = BlacklistMatcher.from_config(config)
+
+# Configurable settings that need a restart to change
+RESTART_SETTINGS = (
+    "MAX_CONCURRENT_REQUESTS", "PERSIST_SNAPSHOT", "HISTORY_CAPACITY", "ROLLUP_RETENTION", "TRACK_SESSIONS", "RENDER_POOL", "RENDER_WORKERS",
+    "LOG_LEVEL", "LOG_JSON", "METRICS_ENABLED", "METRICS_HOST", "METRICS_PORT",
+    "API_CONNECT_TIMEOUT", "API_READ_TIMEOUT", "API_RETRIES", "BREAKER_THRESHOLD", "BREAKER_RESET_TIMEOUT",
+    "LIVE_STATUS_CHANNELS", "LIVE_STATUS_MIN_INTERVAL", "LIVE_STATUS_PIN",
+    "WATCHDOG_ENABLED", "WATCHDOG_THRESHOLD", "LOW_MEMORY_MODE", "AUTO_SHARD", "SHARD_COUNT", "VERSION_SUFFIX", "FEED_MODE", "FEED_SOCKET",
+)
+MAX_CONCURRENT_REQUESTS = config.get("MAX_CONCURRENT_REQUESTS", 10)
+PERSIST_SNAPSHOT = config.get("PERSIST_SNAPSHOT", True)
+HISTORY_CAPACITY = config.get("HISTORY_CAPACITY", 100000)
+ROLLUP_RETENTION = config.get("ROLLUP_RETENTION") or {}
+TRACK_SESSIONS = config.get("TRACK_SESSIONS", True)
+RENDER_POOL = config.get("RENDER_POOL", "thread")
+RENDER_WORKERS = config.get("RENDER_WORKERS", 1)
+METRICS_ENABLED = config.get("METRICS_ENABLED", False)
+METRICS_HOST = config.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = config.get("METRICS_PORT", 9108)
+LOW_MEMORY_MODE = config.get("LOW_MEMORY_MODE", True)
+AUTO_SHARD = config.get("AUTO_SHARD", False)
+SHARD_COUNT = config.get("SHARD_COUNT")
+LIVE_STATUS_CHANNELS = config.get("LIVE_STATUS_CHANNELS") or []
+LIVE_STATUS_MIN_INTERVAL = config.get("LIVE_STATUS_MIN_INTERVAL", 30)
+LIVE_STATUS_PIN = config.get("LIVE_STATUS_PIN", True)
+WATCHDOG_ENABLED = config.get("WATCHDOG_ENABLED", False)
+WATCHDOG_THRESHOLD = config.get("WATCHDOG_THRESHOLD", 0.25)
+FEED_MODE = config.get("FEED_MODE", "off")
+FEED_SOCKET = config.get("FEED_SOCKET") or default_socket_path()
 VERSION_SUFFIX = config.get("VERSION_SUFFIX", "-Public")  # Get version suffix from config
 BOT_VERSION = "v4.3.1" + VERSION_SUFFIX  # Append the suffix to the bot version
 
-# Setup logging with Loguru
-logger.add(sys.stdout, format="{time} {level} {message}", level="INFO")
+# Setup logging with Loguru: one queued stdout sink, with per-server poll records sampled
+setup_logging(config.get("LOG_LEVEL", "INFO"), config.get("LOG_JSON", False))
+poll_log_sampler = LogSampler(LOG_POLL_SAMPLE_RATE)
+logger.debug(f"Parsing API responses with {JSON_DECODER}.")
 
 # Discord bot configuration
-intents = discord.Intents.default()
-intents.guilds = True
-intents.guild_messages = True
-intents.message_content = True
-intents.members = True
-intents.presences = True
-
-client = commands.Bot(command_prefix='!', intents=intents, help_command=None)
-
-# Save and load JSON data
-def save_data_to_json(data, filename):
+def build_intents():
+    if LOW_MEMORY_MODE:
+        # Only what prefix commands need; no member, presence or typing events from the gateway
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+        intents.dm_messages = True
+        intents.message_content = True
+        return intents
+
+    intents = discord.Intents.default()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.message_content = True
+    intents.members = True
+    intents.presences = True
+    return intents
+
+def create_client():
+    options = {"command_prefix": '!', "intents": build_intents(), "help_command": None}
+    if LOW_MEMORY_MODE:
+        # Nothing reads members or old messages, so don't keep them in memory
+        options["member_cache_flags"] = discord.MemberCacheFlags.none()
+        options["chunk_guilds_at_startup"] = False
+        options["max_messages"] = None
+    if AUTO_SHARD:
+        return commands.AutoShardedBot(shard_count=SHARD_COUNT, **options)
+    return commands.Bot(**options)
+
+client = create_client()
+
+# Latest poll result, kept in memory; written behind to DATA_FILE when PERSIST_SNAPSHOT is on
+snapshot_store = SnapshotStore(DATA_FILE, persist=PERSIST_SNAPSHOT)
+snapshot_store.load()
+
+# Player-count history in a fixed-size memory-mapped file, kept across restarts
+player_history = PlayerHistory(HISTORY_FILE, HISTORY_CAPACITY)
+
+# Long-term player counts in SQLite, rolled up into minute, hour and day buckets for long windows
+rollup_store = RollupStore(ROLLUP_FILE, ROLLUP_RETENTION)
+
+# Join/leave tracking and play time per player, from the player lists in each poll
+player_sessions = PlayerSessions(SESSIONS_FILE)
+if TRACK_SESSIONS:
+    player_sessions.load()
+
+# Renders the !players image in a worker pool and caches the PNG per count
+renderer = PlayerCountRenderer(RENDER_POOL, RENDER_WORKERS)
+
+# !players is limited per user, channel and guild; throttled callers get a short text reply instead,
+# itself limited per user so spamming can't turn into a flood of replies
+players_limiter = RateLimiter(PLAYERS_RATE_LIMITS)
+players_notice_limiter = RateLimiter({"user": PLAYERS_NOTICE_LIMIT})
+# Concurrent !players in one channel for the same snapshot share one upload
+players_uploads = SingleFlight()
+recent_player_uploads = {}
+
+# Skips unchanged presence updates and coalesces bursts into one per rate-limit window
+presence = PresenceManager(client, PRESENCE_MIN_INTERVAL, ENABLE_STATUS)
+
+# Pinned status messages edited in place when the count changes, so nobody needs to run !players
+live_status = LiveStatusBoard(client, LIVE_STATUS_CHANNELS, LIVE_STATUS_FILE, LIVE_STATUS_MIN_INTERVAL, LIVE_STATUS_PIN)
+profiler.mark("bot setup")
+
+# Function to set the bot's status based on API data from every configured server
+async def set_bot_status(api_client):
     try:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=4)
-        logger.info(f"Data successfully written to '{filename}'.")
-    except Exception as e:
-        logger.error(f"Error writing to '{filename}': {e}")
-
-def load_json_data(filename):
-    if os.path.isfile(filename):
-        try:
-            with open(filename, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error reading from '{filename}': {e}")
-    return {}
-
-# Function to set the bot's status based on API data
-async def set_bot_status(session):
-    try:
-        async with session.get(f"https://api.scpslgame.com/serverinfo.php?id={ID}&key={API_KEY}&players=true") as response:
-            content_type = response.headers.get('Content-Type', '')
-            logger.info(f"Content-Type received: {content_type}")
-
-            raw_text = await response.text()
-            logger.info(f"Raw content: {raw_text}")
-
-            try:
-                data = json.loads(raw_text)
-            except json.JSONDecodeError as json_err:
-                logger.error(f"Failed to parse response as JSON: {json_err}")
-                await client.change_presence(status=discord.Status.idle, activity=discord.Game(name="Error parsing server data"))
-                return
-
-            if data.get("Success"):
-                player_count = data["Servers"][SERVER_INDEX]["Players"]
-                total_players, total_slots = map(int, player_count.split("/"))
-
-                status = (discord.Status.idle if total_players == 0 else 
-                          discord.Status.dnd if total_players == total_slots else 
-                          discord.Status.online)
-                activity_message = f"{total_players}/{total_slots} players online"
-                await client.change_presence(status=status, activity=discord.Game(name=activity_message))
-                logger.info(f"Player count: {activity_message}")
-                
-                save_data_to_json(data, DATA_FILE)
-            else:
-                logger.error(f"API Error: {data.get('Error')}")
-                await client.change_presence(status=discord.Status.idle, activity=discord.Game(name="Error fetching player data"))
+        results = await poll_servers(api_client, SERVERS, MAX_CONCURRENT_REQUESTS, poll_log_sampler)
+        if feed_publisher is not None:
+            feed_publisher.publish(results)
+        return await apply_poll_results(results)
 
     except Exception as e:
         logger.error(f"Error fetching status from API: {e}")
-        await client.change_presence(status=discord.Status.idle, activity=discord.Game(name=f"Error: {e}"))
-
-# Reconnect logic with exponential backoff
-async def reconnect_with_backoff(max_retries=10):
-    retry_delay = 1
-    for attempt in range(max_retries):
-        try:
-            session = await create_session()
-            return session
-        except Exception as e:
-            logger.error(f"Reconnect attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                logger.info(f"Retrying in {retry_delay} seconds...")
-                await asyncio.sleep(retry_delay)
-                retry_delay *= 2
-            else:
-                logger.error("Max reconnect attempts reached, giving up.")
-                break
-
-# Restart the bot
-async def restart_bot():
-    logger.warning("Restarting the bot due to connection issues...")
-    os.execv(sys.executable, ['python'] + sys.argv)
+        await presence.update(discord.Status.idle, "Error fetching player data")
+
+# Update presence, the snapshot, history and sessions from one poll, made here or read from the feed;
+# fetched_at is when the poll was made, now unless it came from the feed
+async def apply_poll_results(results, fetched_at=None):
+    total_players, total_slots, online = aggregate_results(results)
+
+    if online == 0:
+        error = results[0].error if results else "No servers configured"
+        await presence.update(discord.Status.idle, error)
+        # Commands keep answering from the last good snapshot, but the live message shows the outage
+        live_status.update(Snapshot.from_results(snapshot_store.current.version, results, fetched_at))
+        return
+
+    status = (discord.Status.idle if total_players == 0 else
+              discord.Status.dnd if total_players == total_slots else
+              discord.Status.online)
+    activity_message = f"{total_players}/{total_slots} players online"
+    if len(results) > 1:
+        activity_message += f" on {online} servers"
+    await presence.update(status, activity_message)
+    logger.bind(event="poll_summary", players=total_players, slots=total_slots, servers=online).info("Player count updated")
+
+    live_status.update(snapshot_store.update(results, fetched_at))
+    player_history.append(total_players, total_slots, fetched_at)
+    rollup_store.append(total_players, total_slots, fetched_at)
+    if TRACK_SESSIONS:
+        player_sessions.update(results, total_players, fetched_at)
+    return total_players, total_slots
 
 async def create_session():
-    return aiohttp.ClientSession()
+    return ApiClient.from_config(config, MAX_CONCURRENT_REQUESTS, WAIT_TIME)
+
+# Adaptive polling speeds up while the count moves and backs off while it doesn't;
+# the budget is per API key, so the key with the most requests per poll decides the shortest interval
+def create_poll_policy():
+    if not ADAPTIVE_POLLING:
+        return None
+    requests_per_key = {}
+    for _, _, api_key in group_targets(SERVERS):
+        requests_per_key[api_key] = requests_per_key.get(api_key, 0) + 1
+    return AdaptiveInterval(ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL, REQUEST_BUDGET_PER_HOUR,
+                            max(requests_per_key.values(), default=1))
+
+# The only poll loop; it owns the API client (timeouts, retries, circuit breaker) for the lifetime of the bot
+poll_scheduler = PollScheduler(set_bot_status, create_session, WAIT_TIME, POLL_JITTER, create_poll_policy())
+
+# Several bots can share one poller: "publish" serves this bot's polls on FEED_SOCKET,
+# "subscribe" takes polls from there instead of calling the API
+feed_publisher = FeedPublisher(FEED_SOCKET) if FEED_MODE == "publish" else None
+feed_subscriber = FeedSubscriber(FEED_SOCKET, apply_poll_results) if FEED_MODE == "subscribe" else None
+
+def start_polling():
+    if feed_subscriber is not None:
+        feed_subscriber.start()
+    else:
+        poll_scheduler.start()
+
+# Apply a reloaded config.yml: reschedule the poller, rebuild the blacklist and limiters, toggle presence
+async def apply_config(new_config):
+    global config, blacklist_matcher, players_limiter, players_notice_limiter
+    messages = [f"{key} changed; restart the bot to apply it." for key in RESTART_SETTINGS
+                if new_config.get(key) != config.get(key)]
+    old_cadence = (WAIT_TIME, POLL_JITTER, ADAPTIVE_POLLING, ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL,
+                   REQUEST_BUDGET_PER_HOUR, len(SERVERS))
+    old_limits = (PLAYERS_RATE_LIMITS, PLAYERS_NOTICE_LIMIT)
+
+    config = new_config
+    read_live_settings(config)
+
+    blacklist_matcher = BlacklistMatcher.from_config(config)
+    if (PLAYERS_RATE_LIMITS, PLAYERS_NOTICE_LIMIT) != old_limits:
+        players_limiter = RateLimiter(PLAYERS_RATE_LIMITS)
+        players_notice_limiter = RateLimiter({"user": PLAYERS_NOTICE_LIMIT})
+    poll_log_sampler.rate = max(1, int(LOG_POLL_SAMPLE_RATE))
+    presence.min_interval = PRESENCE_MIN_INTERVAL
+    if (WAIT_TIME, POLL_JITTER, ADAPTIVE_POLLING, ADAPTIVE_MIN_INTERVAL, ADAPTIVE_MAX_INTERVAL,
+            REQUEST_BUDGET_PER_HOUR, len(SERVERS)) != old_cadence:
+        poll_scheduler.reschedule(WAIT_TIME, POLL_JITTER, create_poll_policy())
+    await presence.set_enabled(ENABLE_STATUS)
+    config_watcher.interval = config.get("CONFIG_RELOAD_INTERVAL", 5)
+    if update_checker is not None:
+        old_interval = update_checker.interval
+        update_checker.configure(config)
+        if not update_checker.enabled or update_checker.interval != old_interval:
+            update_checker.stop()  # restarted below so the new interval doesn't wait out the old one
+        if update_checker.enabled:
+            update_checker.start()
+
+    for message in messages:
+        logger.warning(message)
+    return messages
+
+config_watcher = ConfigWatcher(
+    os.path.join(os.path.dirname(__file__), 'config.yml'), apply_config, config.get("CONFIG_RELOAD_INTERVAL", 5)
+)
+
+# The updater is only imported when it is first needed
+update_checker = None
+restart_requested = False
+
+# After an update: log out so main() runs its shutdown, then the process restarts itself
+async def request_restart():
+    global restart_requested
+    restart_requested = True
+    await client.close()
+
+def get_update_checker():
+    global update_checker
+    if update_checker is None:
+        from updater import UpdateChecker
+        update_checker = UpdateChecker(BOT_VERSION, config, on_restart=request_restart)
+    return update_checker
 
 # Event: When the bot is ready
 @client.event
 async def on_ready():
     logger.info("The bot is running.")
-    
-    # Check for updates when the bot starts
-    await check_for_updates(BOT_VERSION, VERSION_SUFFIX)
-    
-    session = await create_session()
-    while True:
-        await set_bot_status(session)
-        await asyncio.sleep(WAIT_TIME)
+    profiler.mark("connect to Discord")
+    profiler.report()
+    presence.invalidate()
+    start_polling()
+    config_watcher.start()
+
+    # Check for updates in the background
+    get_update_checker().start()
 
 # Event: Bot disconnects
 @client.event
 async def on_disconnect():
+    # discord.py reconnects on its own; the poll scheduler keeps running meanwhile
     logger.warning("Bot disconnected from Discord.")
-    await reconnect_with_backoff()
 
 # Event: Bot resumes connection
 @client.event
 async def on_resumed():
     logger.info("Bot reconnected to Discord.")
-    session = await create_session()
-    while True:
-        await set_bot_status(session)
-        await asyncio.sleep(WAIT_TIME)
+    start_polling()
 
 # Event: Message processing and command handling
 @client.event
@@ -185,12 +355,22 @@ async def on_message(message):
     if message.author == client.user:
         return
 
-    if any(blacklisted_word in message.content.lower() for blacklisted_word in BLACKLIST):
+    if blacklist_matcher.search(message.content) is not None:
         logger.info(f"Ignored a message containing a blacklisted word: {message.content}")
+        BLACKLIST_DROPS.inc()
         return
 
     await client.process_commands(message)
 
+# Time every command for the metrics endpoint
+@client.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@client.after_invoke
+async def record_command_time(ctx):
+    COMMAND_LATENCY.observe(time.perf_counter() - ctx.started_at, command=ctx.command.qualified_name)
+
 # Basic commands
 @client.command(name='ping')
 async def ping(ctx):
@@ -208,48 +388,317 @@ async def help_command(ctx):
         description=(
             "`!ping` - Check the bot's latency.\n"
             "`!help` - Display this help message.\n"
-            "`!players` - Display the amount of players currently in the server.\n"
+            "`!players [server]` - Display the amount of players currently in the servers.\n"
+            "`!servers` - List the player count of every server.\n"
+            "`!chart [24h|7d|30d]` - Chart the player count over a window.\n"
+            "`!history [window]` - Player count statistics over a window such as 30m, 24h or 7d.\n"
+            "`!top playtime` - The players with the most time on the servers.\n"
+            "`!seen <player>` - When a player was last online, by nickname or ID.\n"
+            "`!peak` - The most players ever online at once.\n"
+            "`!polling` - Show the current poll interval and API requests saved.\n"
             "`!version` - Displays the bot's current version.\n"
-            "`!json_test` - Test reading from the JSON file.\n"
+            "`!json_test` - Show the latest cached server data.\n"
         ),
         color=discord.Color.blue()
     )
     await ctx.send(embed=embed)
 
+# Reply to a !players call that doesn't get its own image, pointing at the last one when there is one
+async def send_player_count_reply(ctx, total_players, total_slots, message=None):
+    text = f"**{total_players:,} / {total_slots:,}** players online"
+    if message is not None:
+        text += f" ({message.jump_url})"
+    await ctx.reply(text, mention_author=False)
+
+async def upload_player_count(ctx, total_players, total_slots):
+    png = await renderer.render(total_players, total_slots, RENDER_THEME)
+    return await ctx.send(file=discord.File(fp=io.BytesIO(png), filename='player_count.png'))
+
 # Command to display player count
 @client.command(name='players')
-async def player_count(ctx):
-    global last_query_time
-
-    current_time = time.time()
-    
-    if current_time - last_query_time >= QUERY_INTERVAL:
-        try:
-            data = load_json_data(DATA_FILE)
-            if data.get("Success"):
-                last_query_time = current_time
-                player_count = data["Servers"][SERVER_INDEX]["Players"]
-                total_players, total_slots = map(int, player_count.split("/"))
-
-                fig, ax = plt.subplots(figsize=(10, 5))
-                fig.patch.set_facecolor('#1c1c1c')
-
-                plt.text(0.5, 0.5, f'{total_players:,} / {total_slots:,}\nPlayers Online', 
-                         horizontalalignment='center', verticalalignment='center', 
-                         fontsize=50, color='#4CAF50', fontweight='bold',
-                         transform=ax.transAxes)
-
-                ax.axis('off')
-                buf = io.BytesIO()
-                plt.savefig(buf, format='png', bbox_inches='tight', facecolor=fig.get_facecolor())
-                buf.seek(0)
-                await ctx.send(file=discord.File(fp=buf, filename='player_count.png'))
-                plt.close(fig)
-            else:
+async def player_count(ctx, *, server_name=None):
+    try:
+        snapshot = snapshot_store.current
+        if server_name is None:
+            if not snapshot.success:
                 await ctx.send("Error: Unable to fetch player data.")
-        except Exception as e:
-            logger.error(f"Error fetching player count: {e}")
-            await ctx.send("Error fetching player count.")
+                return
+            total_players, total_slots = snapshot.players, snapshot.slots
+        else:
+            info = snapshot.servers.get(server_name)
+            if not isinstance(info, ServerInfo):
+                await ctx.send("Error: Unable to fetch player data.")
+                return
+            total_players, total_slots = info.players, info.slots
+
+        key = (ctx.channel.id, snapshot.version, server_name)
+        uploaded = recent_player_uploads.get(key)
+        # Channels with a live status message already show the count; point at it instead of uploading
+        if uploaded is None and server_name is None:
+            uploaded = live_status.message_in(ctx.channel)
+
+        if uploaded is not None or players_limiter.acquire(ctx):
+            if players_notice_limiter.acquire(ctx):
+                # Over the reply limit: a reaction is cheap and still shows the command was seen
+                try:
+                    await ctx.message.add_reaction("⏳")
+                    return
+                except discord.HTTPException as e:
+                    logger.debug(f"Can't react to !players from {ctx.author.id}, replying instead: {e}")
+            await send_player_count_reply(ctx, total_players, total_slots, uploaded)
+            return
+
+        message, shared = await players_uploads.do(key, lambda: upload_player_count(ctx, total_players, total_slots))
+        if shared:
+            await send_player_count_reply(ctx, total_players, total_slots, message)
+            return
+
+        # Only uploads of the current snapshot can be reused
+        for old_key in [old_key for old_key in recent_player_uploads if old_key[1] != snapshot.version]:
+            del recent_player_uploads[old_key]
+        recent_player_uploads[key] = message
+    except Exception as e:
+        logger.error(f"Error fetching player count: {e}")
+        await ctx.send("Error fetching player count.")
+
+# Command to list the player count of every server
+@client.command(name='servers')
+async def server_list(ctx):
+    snapshot = snapshot_store.current
+    if not snapshot.servers:
+        await ctx.send("Error: Unable to fetch player data.")
+        return
+
+    lines = [f"**{name}**: {server.count if isinstance(server, ServerInfo) else server}" for name, server in snapshot.servers.items()]
+    embed = discord.Embed(
+        title="Servers",
+        description="\n".join(lines),
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=f"Total: {snapshot.count} players online")
+    await ctx.send(embed=embed)
+
+# Command to summarise the player count history
+@client.command(name='history')
+async def history(ctx, window='24h'):
+    try:
+        window_seconds = parse_window(window)
+    except ValueError as e:
+        await ctx.send(f"Error: {e}")
+        return
+
+    # The ring buffer has every sample for recent windows; longer ones read the rollups
+    if window_seconds > 86400:
+        stats = await rollup_store.stats(window_seconds)
+    else:
+        stats = player_history.stats(window_seconds)
+    if stats.samples == 0:
+        await ctx.send(f"No player data recorded in the last {window}.")
+        return
+
+    embed = discord.Embed(
+        title=f"Player History ({window})",
+        description=(
+            f"Peak: **{stats.max_players:,}** <t:{int(stats.peak_time)}:R>\n"
+            f"Average: **{stats.mean_players:,.1f}**\n"
+            f"Lowest: **{stats.min_players:,}**\n"
+            f"Slots: **{stats.slots:,}**\n"
+            f"Since: <t:{int(stats.first)}:f>"
+        ),
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=f"{stats.samples:,} samples")
+    await ctx.send(embed=embed)
+
+def format_duration(seconds):
+    minutes, _ = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+# Command to list the players with the most play time
+@client.command(name='top')
+async def top(ctx, category='playtime'):
+    if not TRACK_SESSIONS:
+        await ctx.send("Player tracking is disabled.")
+        return
+    if category.lower() != 'playtime':
+        await ctx.send("Usage: `!top playtime`")
+        return
+
+    leaders = player_sessions.top_playtime(10)
+    if not leaders:
+        await ctx.send("No players tracked yet.")
+        return
+    lines = [
+        f"**{rank}.** {discord.utils.escape_markdown(info.name)} - {format_duration(info.playtime)}" + (" (online)" if info.online else "")
+        for rank, info in enumerate(leaders, start=1)
+    ]
+    embed = discord.Embed(title="Top Play Time", description="\n".join(lines), color=discord.Color.blue())
+    embed.set_footer(text=f"{len(player_sessions):,} players tracked")
+    await ctx.send(embed=embed)
+
+# Command to show when a player was last online
+@client.command(name='seen')
+async def seen(ctx, *, player=None):
+    if not TRACK_SESSIONS:
+        await ctx.send("Player tracking is disabled.")
+        return
+    if not player:
+        await ctx.send("Usage: `!seen <nickname or ID>`")
+        return
+
+    info = player_sessions.find(player.strip())
+    if info is None:
+        await ctx.send("I haven't seen that player.")
+        return
+    name = discord.utils.escape_markdown(info.name)
+    if info.online:
+        status = f"online on **{info.server}** since <t:{int(info.online_since)}:R>"
+    else:
+        status = f"last seen <t:{int(info.last_seen)}:R>"
+    await ctx.send(f"**{name}** is {status}. Total play time: {format_duration(info.playtime)}, first seen <t:{int(info.first_seen)}:D>.")
+
+# Command to show the player count peaks
+@client.command(name='peak')
+async def peak(ctx):
+    if not TRACK_SESSIONS:
+        await ctx.send("Player tracking is disabled.")
+        return
+
+    all_time, all_time_at = player_sessions.peak
+    today, today_at = player_sessions.today_peak()
+    if not all_time_at:
+        await ctx.send("No player data recorded yet.")
+        return
+    description = f"All time: **{all_time:,}** <t:{int(all_time_at)}:R>\n"
+    description += f"Today (UTC): **{today:,}**" + (f" <t:{int(today_at)}:t>" if today_at else "") + "\n"
+    description += f"Tracked online now: **{len(player_sessions.online):,}**"
+    embed = discord.Embed(title="Player Peaks", description=description, color=discord.Color.blue())
+    await ctx.send(embed=embed)
+
+# Command to chart the player count; long windows read coarser rollups and are downsampled before drawing
+@client.command(name='chart')
+async def chart(ctx, window='24h'):
+    try:
+        window_seconds = parse_window(window)
+    except ValueError as e:
+        await ctx.send(f"Error: {e}")
+        return
+
+    tier, rows = await rollup_store.series(time.time() - window_seconds)
+    if len(rows) < 2:
+        await ctx.send(f"Not enough player data recorded in the last {window} for a chart.")
+        return
+    png = await renderer.render_chart(f"Players Online ({window})", rows, RENDER_THEME)
+    await ctx.send(file=discord.File(fp=io.BytesIO(png), filename='player_chart.png'))
+
+# Command to show the effective poll interval
+@client.command(name='polling')
+async def polling(ctx):
+    if feed_subscriber is not None:
+        state = "connected" if feed_subscriber.connected else "disconnected"
+        last = f"<t:{int(feed_subscriber.last_fetched_at)}:R>" if feed_subscriber.last_fetched_at else "never"
+        await ctx.send(f"Polls come from the shared feed at `{FEED_SOCKET}` ({state}); "
+                       f"{feed_subscriber.received:,} received, last poll {last}.")
+        return
+
+    stats = poll_scheduler.stats()
+    mode = "Adaptive" if poll_scheduler.policy else "Fixed"
+    embed = discord.Embed(
+        title="Polling",
+        description=(
+            f"Mode: **{mode}**\n"
+            f"Current interval: **{stats['interval']:g}s** (base {poll_scheduler.base_interval:g}s)\n"
+            f"Polls made: **{stats['polls']:,}** of {stats['fixed_polls']:,} at the base interval\n"
+            f"API requests saved: **{stats['saved'] * len(SERVERS):,}**"
+        ),
+        color=discord.Color.blue()
+    )
+    await ctx.send(embed=embed)
+
+# Owner command to check for or install an update
+@client.command(name='update')
+@commands.is_owner()
+async def update(ctx, action='check'):
+    checker = get_update_checker()
+    if action == 'install':
+        await ctx.send("Installing the update, the bot will restart when it is done.")
+        if not await checker.install():
+            await ctx.send("Update failed or no update available, see the logs.")
+        return
+
+    available = await checker.check()
+    if available:
+        await ctx.send(f"Version {available['tag_name']} is available (running {BOT_VERSION}). Use `!update install` to install it.")
+    else:
+        await ctx.send(f"You are running the latest version ({BOT_VERSION}).")
+
+# Event loop diagnostics: the stall watchdog starts with the bot when WATCHDOG_ENABLED is set, or on
+# demand with !debug perf on; the sampling profiler only runs between !debug profile start and stop
+loop_watchdog = LoopWatchdog(WATCHDOG_THRESHOLD)
+sampling_profiler = SamplingProfiler()
+
+# Owner command for event loop stalls (!debug perf [on|off]) and the sampling profiler (!debug profile start|stop)
+@client.command(name='debug')
+@commands.is_owner()
+async def debug(ctx, topic='perf', action=None):
+    if topic == 'perf':
+        if action == 'on':
+            loop_watchdog.start()
+        elif action == 'off':
+            loop_watchdog.stop()
+            await ctx.send("Event loop watchdog stopped.")
+            return
+        if not loop_watchdog.running:
+            await ctx.send("The event loop watchdog is off. Use `!debug perf on` or set WATCHDOG_ENABLED.")
+            return
+
+        lines = [
+            f"Loop lag now {loop_watchdog.last_lag * 1000:.0f} ms, worst {loop_watchdog.max_lag * 1000:.0f} ms",
+            f"Stalls over {loop_watchdog.threshold * 1000:.0f} ms: {loop_watchdog.stall_count}",
+        ]
+        for stall in loop_watchdog.top_stalls()[:5]:
+            lines.append(f"  {stall.duration * 1000:6.0f} ms <t:{int(stall.started_at)}:R>  {stall.where}")
+        lines.append("Slowest callbacks:")
+        for elapsed, name, _ in loop_watchdog.top_callbacks()[:5]:
+            lines.append(f"  {elapsed * 1000:6.0f} ms  {name}")
+        path = await asyncio.get_running_loop().run_in_executor(None, loop_watchdog.dump, PERF_DUMP_FILE)
+        await ctx.send(truncate("\n".join(lines), 1900), file=discord.File(path))
+
+    elif topic == 'profile':
+        if action == 'start':
+            sampling_profiler.start()
+            await ctx.send("Sampling profiler started. Use `!debug profile stop` to see the results.")
+        elif action == 'stop':
+            if not sampling_profiler.running:
+                await ctx.send("The sampling profiler isn't running.")
+                return
+            await asyncio.get_running_loop().run_in_executor(None, sampling_profiler.stop)
+            lines = [f"{sampling_profiler.samples:,} samples"]
+            lines += [f"  {share:6.1%}  {name}" for share, name in sampling_profiler.top_functions(15)]
+            path = await asyncio.get_running_loop().run_in_executor(None, sampling_profiler.dump, PROFILE_FILE)
+            await ctx.send(truncate("\n".join(lines), 1900), file=discord.File(path))
+        else:
+            state = "running" if sampling_profiler.running else "stopped"
+            await ctx.send(f"Sampling profiler is {state}. Usage: `!debug profile start|stop`")
+
+    else:
+        await ctx.send("Usage: `!debug perf [on|off]` or `!debug profile start|stop`")
+
+# Owner command to reload config.yml right away
+@client.command(name='reload')
+@commands.is_owner()
+async def reload(ctx):
+    applied, messages = await config_watcher.reload()
+    if applied:
+        await ctx.send("\n".join(["Reloaded config.yml."] + messages))
+    else:
+        await ctx.send("\n".join(["config.yml was not reloaded:"] + messages))
 
 # Command to display bot version
 @client.command(name='version')
@@ -259,8 +708,47 @@ async def version(ctx):
 # Command to test JSON reading
 @client.command(name='json_test')
 async def json_test(ctx):
-    data = load_json_data(DATA_FILE)
-    await ctx.send(f"JSON Data: {json.dumps(data, indent=4)}")
+    snapshot = snapshot_store.current
+    await ctx.send(f"JSON Data (version {snapshot.version}, {snapshot.age:.0f}s old): {json.dumps(snapshot.data, indent=4)}")
+
+# Run the bot, then stop the poller and release its session and files on shutdown
+async def main():
+    metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT) if METRICS_ENABLED else None
+    try:
+        if metrics_server:
+            await metrics_server.start()
+        if feed_publisher is not None:
+            await feed_publisher.start()
+        if WATCHDOG_ENABLED:
+            loop_watchdog.start()
+        async with client:
+            await client.start(BOT_TOKEN)
+    finally:
+        await poll_scheduler.stop()
+        if feed_subscriber is not None:
+            feed_subscriber.stop()
+        if feed_publisher is not None:
+            await feed_publisher.stop()
+        config_watcher.stop()
+        loop_watchdog.stop()
+        sampling_profiler.stop()
+        if update_checker is not None:
+            update_checker.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        renderer.shutdown()
+        player_history.close()
+        player_sessions.close()
+        rollup_store.close()
+        await logger.complete()
+
+if __name__ == "__main__":
+    discord.utils.setup_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    if restart_requested:
+        from updater import restart_process
+        restart_process()
 
-# Run the bot
-client.run(BOT_TOKEN)
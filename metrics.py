@@ -0,0 +1,181 @@
+import asyncio
+import time
+from loguru import logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+# Base for a named metric family with optional labels
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = state[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    # Time the body of a with-block in seconds
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+# Every metric the bot exposes; modules record into these directly
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+API_LATENCY = REGISTRY.register(Histogram("scpsl_api_request_seconds", "Round-trip time of SCP:SL API requests.", ["server"]))
+API_ERRORS = REGISTRY.register(Counter("scpsl_api_errors_total", "Failed SCP:SL API requests.", ["server", "reason"]))
+PARSE_LATENCY = REGISTRY.register(Histogram("scpsl_json_parse_seconds", "Time spent parsing API responses.",
+                                            buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1)))
+PARSE_FAILURES = REGISTRY.register(Counter("scpsl_json_parse_failures_total", "API responses that could not be parsed.", ["server"]))
+RENDER_LATENCY = REGISTRY.register(Histogram("scpsl_render_seconds", "Time spent rendering !players and !chart images."))
+RENDER_CACHE_HITS = REGISTRY.register(Counter("scpsl_render_cache_hits_total", "!players images served from the render cache."))
+COMMAND_LATENCY = REGISTRY.register(Histogram("scpsl_command_seconds", "Time spent handling bot commands.", ["command"]))
+PRESENCE_UPDATES = REGISTRY.register(Counter("scpsl_presence_updates_total", "Presence updates by outcome.", ["result"]))
+BLACKLIST_DROPS = REGISTRY.register(Counter("scpsl_blacklist_drops_total", "Messages ignored for containing a blacklisted word."))
+PLAYER_EVENTS = REGISTRY.register(Counter("scpsl_player_events_total", "Players joining or leaving a server.", ["event"]))
+TRACKED_PLAYERS = REGISTRY.register(Gauge("scpsl_tracked_players", "Unique players with tracked sessions."))
+API_RETRIES = REGISTRY.register(Counter("scpsl_api_retries_total", "SCP:SL API requests retried after a transient failure."))
+BREAKER_STATE = REGISTRY.register(Gauge("scpsl_api_circuit_state", "SCP:SL API circuit breaker: 0 closed, 1 open, 2 half-open."))
+LOOP_LAG = REGISTRY.register(Gauge("scpsl_event_loop_lag_seconds", "Most recent event loop lag."))
+LOOP_LAG_HISTOGRAM = REGISTRY.register(Histogram("scpsl_event_loop_lag_seconds_distribution", "Event loop lag samples."))
+
+# Measures how late a short sleep wakes up, which is how long the loop was blocked
+async def monitor_loop_lag(interval=0.5):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - started - interval)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+
+# Serves /metrics in Prometheus text format from the bot's own event loop
+class MetricsServer:
+    def __init__(self, host="127.0.0.1", port=9108, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner = None
+        self._lag_task = None
+
+    async def _handle_metrics(self, request):
+        from aiohttp import web
+        return web.Response(body=self.registry.expose().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    async def start(self):
+        # Only imported when the endpoint is enabled
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_task = asyncio.ensure_future(monitor_loop_lag())
+        logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,107 @@
+import json
+
+# orjson parses bytes several times faster than the standard library; it is optional
+try:
+    import orjson
+    _loads = orjson.loads
+    JSON_DECODER = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_DECODER = "json"
+
+# A response or entry that doesn't have the shape the SCP:SL API documents
+class ModelError(ValueError):
+    pass
+
+# The API answered, but with Success false
+class ApiError(Exception):
+    pass
+
+def _count(value, field):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ModelError(f"{field} must be a non-negative integer, got {value!r}")
+    return value
+
+# One player from a server's PlayersList
+class PlayerEntry:
+    __slots__ = ("player_id", "nickname")
+
+    def __init__(self, player_id, nickname):
+        self.player_id = player_id
+        self.nickname = nickname
+
+    @classmethod
+    def from_dict(cls, entry):
+        if not isinstance(entry, dict):
+            raise ModelError(f"PlayersList entries must be objects, got {type(entry).__name__}")
+        player_id = entry.get("ID")
+        nickname = entry.get("Nickname")
+        return cls(str(player_id) if player_id else None, str(nickname) if nickname is not None else None)
+
+    def to_dict(self):
+        return {"ID": self.player_id, "Nickname": self.nickname}
+
+# One entry of the "Servers" list, validated once when the poll is parsed and then shared read-only
+class ServerInfo:
+    __slots__ = ("server_id", "port", "online", "players", "slots", "player_list")
+
+    def __init__(self, server_id, port, online, players, slots, player_list=None):
+        self.server_id = server_id
+        self.port = port
+        self.online = online
+        self.players = players
+        self.slots = slots
+        self.player_list = player_list  # tuple of PlayerEntry, or None when the API didn't list players
+
+    @classmethod
+    def from_dict(cls, entry):
+        if not isinstance(entry, dict):
+            raise ModelError(f"Server entries must be objects, got {type(entry).__name__}")
+        count = entry.get("Players")
+        if not isinstance(count, str) or count.count("/") != 1:
+            raise ModelError(f"Players must look like '12/30', got {count!r}")
+        try:
+            players, slots = (int(part) for part in count.split("/"))
+        except ValueError:
+            raise ModelError(f"Players must look like '12/30', got {count!r}") from None
+        _count(players, "Players")
+        _count(slots, "Slots")
+
+        player_list = entry.get("PlayersList")
+        if player_list is not None:
+            if not isinstance(player_list, list):
+                raise ModelError(f"PlayersList must be a list, got {type(player_list).__name__}")
+            player_list = tuple(PlayerEntry.from_dict(player) for player in player_list)
+        return cls(entry.get("ID"), entry.get("Port"), bool(entry.get("Online", True)), players, slots, player_list)
+
+    @property
+    def count(self):
+        return f"{self.players}/{self.slots}"
+
+    def to_dict(self):
+        data = {"ID": self.server_id, "Port": self.port, "Online": self.online, "Players": self.count}
+        if self.player_list is not None:
+            data["PlayersList"] = [player.to_dict() for player in self.player_list]
+        return data
+
+# Parse a serverinfo.php response body straight from bytes; returns its raw "Servers" list
+def parse_server_list(body):
+    data = _loads(body)
+    if not isinstance(data, dict):
+        raise ModelError(f"Response must be an object, got {type(data).__name__}")
+    if not data.get("Success"):
+        raise ApiError(str(data.get("Error")))
+    servers = data.get("Servers")
+    if not isinstance(servers, list):
+        raise ModelError(f"Servers must be a list, got {type(servers).__name__}")
+    return servers
+
+# Validate the entry at index of a parsed "Servers" list
+def server_at(servers, index):
+    if not 0 <= index < len(servers):
+        raise ModelError(f"Response has no server at index {index}")
+    return ServerInfo.from_dict(servers[index])
+
+# Parse a serverinfo.php response body and validate the entry at index
+def parse_server_info(body, index=0):
+    return server_at(parse_server_list(body), index)
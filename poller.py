@@ -0,0 +1,151 @@
+import asyncio
+import time
+from loguru import logger
+from http_client import CircuitOpenError
+from logs import truncate
+from models import ModelError, ApiError, parse_server_list, server_at
+import metrics
+
+API_BASE_URL = "https://api.scpslgame.com"
+DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+
+# A single server to poll: account id, api key and the index into the "Servers" list
+class ServerTarget:
+    def __init__(self, server_id, api_key, name=None, index=0, base_url=API_BASE_URL):
+        self.server_id = server_id
+        self.api_key = api_key
+        self.name = str(name) if name else str(server_id)
+        self.index = index
+        self.url = base_url.rstrip("/") + "/serverinfo.php"
+
+    def __repr__(self):
+        return f"ServerTarget(name={self.name!r}, server_id={self.server_id!r}, index={self.index})"
+
+# The outcome of polling one server: its parsed ServerInfo, or an error message
+class ServerResult:
+    __slots__ = ("target", "info", "error")
+
+    def __init__(self, target, info=None, error=None):
+        self.target = target
+        self.info = info
+        self.error = error
+
+    @property
+    def players(self):
+        return self.info.players if self.info is not None else 0
+
+    @property
+    def slots(self):
+        return self.info.slots if self.info is not None else 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def name(self):
+        return self.target.name
+
+# Build the list of servers to poll from config.yml, falling back to key.py
+def load_server_targets(config, sensitive_info):
+    default_index = config.get("SERVER_INDEX", 0)
+    base_url = config.get("API_BASE_URL") or API_BASE_URL
+    targets = []
+    for entry in config.get("SERVERS") or []:
+        if not isinstance(entry, dict) or not entry.get("id") or not entry.get("key"):
+            logger.error(f"Skipping invalid SERVERS entry in config.yml: {entry}")
+            continue
+        targets.append(ServerTarget(entry["id"], entry["key"], entry.get("name"), entry.get("index", default_index), base_url))
+
+    if not targets and sensitive_info.get("SERVER_ID"):
+        targets.append(ServerTarget(sensitive_info["SERVER_ID"], sensitive_info["API_KEY"], index=default_index, base_url=base_url))
+    return targets
+
+# Targets that share an account and key are answered by the same serverinfo.php request; returns
+# {(url, server_id, api_key): [targets]} in the configured order
+def group_targets(targets):
+    groups = {}
+    for target in targets:
+        groups.setdefault((target.url, target.server_id, target.api_key), []).append(target)
+    return groups
+
+# Fetch one account's server list through the shared ApiClient and parse the entry of every target
+# that uses it, so servers behind the same key cost one request; returns a ServerResult per target
+async def fetch_servers(client, targets, semaphore, log_sampler=None):
+    first = targets[0]
+    params = {"id": first.server_id, "key": first.api_key, "players": "true"}
+    log = logger.bind(event="poll", server=first.name)
+
+    def failed(error, reason):
+        for target in targets:
+            metrics.API_ERRORS.inc(server=target.name, reason=reason)
+        return [ServerResult(target, error=error) for target in targets]
+
+    try:
+        async with semaphore:
+            started = time.perf_counter()
+            status, content_type, body = await client.get(first.url, params=params)
+            elapsed = time.perf_counter() - started
+            elapsed_ms = round(elapsed * 1000, 1)
+        metrics.API_LATENCY.observe(elapsed, server=first.name)
+
+        log = log.bind(status=status, content_type=content_type, bytes=len(body), elapsed_ms=elapsed_ms)
+        log.debug("Raw content: {}", body)
+
+        # Parsed once here; each target validates its own entry and everything downstream shares it
+        try:
+            with metrics.PARSE_LATENCY.time():
+                servers = parse_server_list(body)
+        except ApiError as api_err:
+            log.error("API Error: {}", truncate(str(api_err)))
+            return failed("Error fetching player data", "api")
+        except (ValueError, ModelError) as parse_err:
+            log.error("Failed to parse response: {}. Raw content: {}", parse_err, body.decode('utf-8', 'replace'))
+            for target in targets:
+                metrics.PARSE_FAILURES.inc(server=target.name)
+            return failed("Error parsing server data", "parse")
+
+        results = []
+        for target in targets:
+            target_log = log.bind(server=target.name)
+            try:
+                info = server_at(servers, target.index)
+            except ModelError as parse_err:
+                target_log.error("Failed to parse server {}: {}", target.index, parse_err)
+                metrics.PARSE_FAILURES.inc(server=target.name)
+                metrics.API_ERRORS.inc(server=target.name, reason="parse")
+                results.append(ServerResult(target, error="Error parsing server data"))
+                continue
+            if log_sampler is None or log_sampler():
+                target_log.bind(players=info.players, slots=info.slots).info("Server polled")
+            results.append(ServerResult(target, info))
+        return results
+
+    except CircuitOpenError as e:
+        # Expected while the API is down; the breaker already logged it
+        log.debug("Skipped: {}", e)
+        return failed("API unavailable, retrying soon", "circuit_open")
+
+    except Exception as e:
+        log.error("Error fetching status from API: {!r}", e)
+        return failed("Error fetching player data", type(e).__name__)
+
+# Fetch every server concurrently, one request per account and key, with at most
+# max_concurrent_requests in flight; results come back in the order of targets
+async def poll_servers(client, targets, max_concurrent_requests=DEFAULT_MAX_CONCURRENT_REQUESTS, log_sampler=None):
+    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    groups = list(group_targets(targets).values())
+    batches = await asyncio.gather(*(fetch_servers(client, group, semaphore, log_sampler) for group in groups))
+    results = {}
+    for batch in batches:
+        for result in batch:
+            results[id(result.target)] = result
+    return [results[id(target)] for target in targets]
+
+# Sum the player counts of every server that answered
+def aggregate_results(results):
+    ok_results = [result for result in results if result.ok]
+    total_players = sum(result.players for result in ok_results)
+    total_slots = sum(result.slots for result in ok_results)
+    return total_players, total_slots, len(ok_results)
+
@@ -0,0 +1,89 @@
+import asyncio
+import time
+import discord
+from loguru import logger
+import metrics
+
+# Discord allows roughly 5 presence updates per minute per gateway connection
+DEFAULT_MIN_INTERVAL = 12.0
+
+# Sends presence updates only when they change, at most one per min_interval, always the newest state
+class PresenceManager:
+    def __init__(self, client, min_interval=DEFAULT_MIN_INTERVAL, enabled=True):
+        self.client = client
+        self.min_interval = min_interval
+        self.enabled = enabled
+        self.sent = 0
+        self.skipped = 0
+        self._last_state = None
+        self._last_sent_at = float('-inf')
+        self._pending = None
+        self._flush_task = None
+
+    async def update(self, status, activity_name):
+        if not self.enabled:
+            return
+        state = (status, activity_name)
+
+        # A flush is already scheduled for this window; it will send whatever is newest
+        if self._flush_task is not None and not self._flush_task.done():
+            if self._pending is not None:
+                self.skipped += 1
+                metrics.PRESENCE_UPDATES.inc(result="skipped")
+            self._pending = state
+            return
+
+        if state == self._last_state:
+            self.skipped += 1
+            metrics.PRESENCE_UPDATES.inc(result="skipped")
+            return
+
+        wait = self._last_sent_at + self.min_interval - time.monotonic()
+        if wait > 0:
+            self._pending = state
+            self._flush_task = asyncio.ensure_future(self._flush_later(wait))
+            return
+
+        await self._send(state)
+
+    # Turn the status on or off; turning it off clears the activity shown on the bot
+    async def set_enabled(self, enabled):
+        if enabled == self.enabled:
+            return
+        self.enabled = enabled
+        if enabled:
+            return
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = None
+        self._last_state = None
+        try:
+            await self.client.change_presence(activity=None)
+        except Exception as e:
+            logger.error(f"Error clearing presence: {e}")
+
+    # Forget what was sent, e.g. after a fresh IDENTIFY where Discord dropped the presence
+    def invalidate(self):
+        self._last_state = None
+
+    async def _flush_later(self, delay):
+        await asyncio.sleep(delay)
+        state, self._pending = self._pending, None
+        if state is None or state == self._last_state:
+            self.skipped += 1
+            metrics.PRESENCE_UPDATES.inc(result="skipped")
+            return
+        await self._send(state)
+
+    async def _send(self, state):
+        status, activity_name = state
+        try:
+            await self.client.change_presence(status=status, activity=discord.Game(name=activity_name))
+        except Exception as e:
+            logger.error(f"Error updating presence: {e}")
+            return
+        self._last_state = state
+        self._last_sent_at = time.monotonic()
+        self.sent += 1
+        metrics.PRESENCE_UPDATES.inc(result="sent")
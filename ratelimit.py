@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+# Classic token bucket: holds up to `capacity` tokens and refills completely over `per` seconds
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, capacity, per):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self, now):
+        self._refill(now)
+        return self.tokens >= 1
+
+    def consume(self):
+        self.tokens -= 1
+
+    def retry_after(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+# Separate token buckets per user, channel and guild; a call goes through only if every scope allows it
+class RateLimiter:
+    SCOPES = {
+        "user": lambda ctx: ctx.author.id,
+        "channel": lambda ctx: ctx.channel.id,
+        "guild": lambda ctx: ctx.guild.id if ctx.guild else None,
+    }
+
+    def __init__(self, limits, max_buckets=10000):
+        # limits maps a scope name to [capacity, seconds]
+        self.limits = {scope: tuple(limit) for scope, limit in (limits or {}).items() if scope in self.SCOPES}
+        self.max_buckets = max_buckets
+        self._buckets = {}
+
+    def _bucket(self, scope, key):
+        bucket = self._buckets.get((scope, key))
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._evict_full()
+            bucket = self._buckets[(scope, key)] = TokenBucket(*self.limits[scope])
+        return bucket
+
+    # Full buckets behave exactly like new ones, so they can be dropped to bound memory
+    def _evict_full(self):
+        now = time.monotonic()
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_full(now)]:
+            del self._buckets[key]
+
+    # Returns 0 when the call may go ahead (and takes a token from every scope), else seconds to wait
+    def acquire(self, ctx):
+        now = time.monotonic()
+        buckets = []
+        for scope in self.limits:
+            key = self.SCOPES[scope](ctx)
+            if key is None:
+                continue
+            bucket = self._bucket(scope, key)
+            if not bucket.available(now):
+                return bucket.retry_after()
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.consume()
+        return 0
+
+# Concurrent calls with the same key share one execution and its result
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+
+    # Returns (result, shared): shared is True when the result came from a call already in flight
+    async def do(self, key, factory):
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(result)
+        return result, False
@@ -0,0 +1,151 @@
+import asyncio
+import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from loguru import logger
+import metrics
+from ratelimit import SingleFlight
+
+# Background and text colour of the player count image
+THEMES = {
+    "dark": {"background": "#1c1c1c", "text": "#4CAF50", "grid": "#3a3a3a"},
+    "light": {"background": "#f5f5f5", "text": "#2e7d32", "grid": "#d0d0d0"},
+}
+DEFAULT_THEME = "dark"
+
+# Charts are drawn from at most this many points, about two pixels per point at the default size
+CHART_POINTS = 500
+
+# Draw the player count image; runs in a worker, so it only uses the object-oriented Figure API
+def render_player_count(total_players, total_slots, theme=DEFAULT_THEME):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    colors = THEMES.get(theme, THEMES[DEFAULT_THEME])
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor(colors["background"])
+
+    ax = fig.subplots()
+    ax.text(0.5, 0.5, f'{total_players:,} / {total_slots:,}\nPlayers Online',
+            horizontalalignment='center', verticalalignment='center',
+            fontsize=50, color=colors["text"], fontweight='bold',
+            transform=ax.transAxes)
+    ax.axis('off')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', facecolor=fig.get_facecolor())
+    return buf.getvalue()
+
+# Reduce a (time, min, max, mean) series to at most `points` buckets of equal time span, keeping each
+# bucket's lowest and highest value so peaks survive; vectorized, so the cost is linear in the input
+def downsample_minmax(times, lows, highs, means, points=CHART_POINTS):
+    import numpy as np
+
+    if len(times) <= points:
+        return times, lows, highs, means
+    span = times[-1] - times[0]
+    buckets = np.minimum(((times - times[0]) / span * points).astype(np.int64), points - 1)
+    # Times are sorted, so each bucket is a contiguous run starting where the bucket number changes
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    counts = np.diff(np.append(starts, len(times)))
+    return (
+        times[starts],
+        np.minimum.reduceat(lows, starts),
+        np.maximum.reduceat(highs, starts),
+        np.add.reduceat(means, starts) / counts,
+    )
+
+# Draw a player-count history chart from (time, min, max, mean, slots) rows; runs in a worker
+def render_history_chart(title, rows, theme=DEFAULT_THEME):
+    import numpy as np
+    from datetime import datetime, timezone
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.dates as mdates
+
+    colors = THEMES.get(theme, THEMES[DEFAULT_THEME])
+    data = np.asarray(rows, dtype=np.float64)
+    times, lows, highs, means = downsample_minmax(data[:, 0], data[:, 1], data[:, 2], data[:, 3])
+    dates = mdates.date2num(times.astype("datetime64[s]"))
+
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    fig.patch.set_facecolor(colors["background"])
+    ax = fig.subplots()
+    ax.set_facecolor(colors["background"])
+
+    ax.fill_between(dates, lows, highs, color=colors["text"], alpha=0.25, linewidth=0, step="post")
+    ax.plot(dates, means, color=colors["text"], linewidth=1.5, drawstyle="steps-post")
+    peak = int(np.argmax(highs))
+    ax.scatter([dates[peak]], [highs[peak]], color=colors["text"], zorder=3)
+    ax.annotate(f"Peak {int(highs[peak]):,}", (dates[peak], highs[peak]), textcoords="offset points",
+                xytext=(0, 8), ha="center", color=colors["text"])
+
+    slots = data[-1, 4]
+    ax.set_ylim(0, max(slots, highs.max()) * 1.1 or 1)
+    locator = mdates.AutoDateLocator(tz=timezone.utc)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator, tz=timezone.utc))
+    ax.set_title(title, color=colors["text"], fontweight='bold')
+    ax.set_xlabel(f"UTC, updated {datetime.fromtimestamp(data[-1, 0], timezone.utc):%Y-%m-%d %H:%M}", color=colors["text"])
+    ax.grid(True, color=colors["grid"], linewidth=0.5)
+    ax.tick_params(colors=colors["text"])
+    for spine in ax.spines.values():
+        spine.set_color(colors["grid"])
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', facecolor=fig.get_facecolor())
+    return buf.getvalue()
+
+# Renders images off the event loop and keeps the finished PNG bytes in an LRU cache
+class PlayerCountRenderer:
+    def __init__(self, pool="thread", workers=1, cache_size=64):
+        self.pool = pool
+        self.workers = workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._inflight = SingleFlight()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.pool == "process" else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def render(self, total_players, total_slots, theme=DEFAULT_THEME):
+        return await self._cached((total_players, total_slots, theme), render_player_count, total_players, total_slots, theme)
+
+    # rows come from RollupStore.series; the newest row identifies the data, so it is part of the key
+    async def render_chart(self, title, rows, theme=DEFAULT_THEME):
+        key = ("chart", title, theme, len(rows), rows[-1] if rows else None)
+        return await self._cached(key, render_history_chart, title, rows, theme)
+
+    async def _cached(self, key, func, *args):
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            metrics.RENDER_CACHE_HITS.inc()
+            return png
+
+        # Concurrent requests for the same image wait for one render
+        png, _ = await self._inflight.do(key, lambda: self._render(key, func, *args))
+        return png
+
+    async def _render(self, key, func, *args):
+        loop = asyncio.get_running_loop()
+        with metrics.RENDER_LATENCY.time():
+            png = await loop.run_in_executor(self._get_executor(), func, *args)
+
+        self._cache[key] = png
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        logger.debug(f"Rendered {func.__name__} in the {self.pool} pool.")
+        return png
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
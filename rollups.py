@@ -0,0 +1,207 @@
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from history import HistoryStats, parse_window
+
+# Tiers from finest to coarsest: name, bucket size in seconds (0 for raw samples), and the
+# sample spacing assumed when estimating how many rows a window spans
+TIERS = (
+    ("raw", 0, 15),
+    ("minute", 60, 60),
+    ("hour", 3600, 3600),
+    ("day", 86400, 86400),
+)
+DEFAULT_RETENTION = {"raw": "2d", "minute": "14d", "hour": "400d", "day": None}
+DEFAULT_FLUSH_INTERVAL = 300
+PRUNE_INTERVAL = 3600
+MAX_POINTS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw (ts REAL NOT NULL, players INTEGER NOT NULL, slots INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS raw_ts ON raw (ts);
+""" + "".join(f"""
+CREATE TABLE IF NOT EXISTS {name} (
+    bucket INTEGER PRIMARY KEY,
+    min INTEGER NOT NULL,
+    max INTEGER NOT NULL,
+    sum INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    slots INTEGER NOT NULL
+);""" for name, size, _ in TIERS if size)
+
+# Turn {"raw": "2d", ...} from config.yml into seconds; None or 0 keeps a tier forever
+def parse_retention(retention):
+    seconds = {}
+    for name, _, _ in TIERS:
+        value = (retention or {}).get(name, DEFAULT_RETENTION[name])
+        seconds[name] = parse_window(str(value)) if value else None
+    return seconds
+
+# Long-term player counts in SQLite: raw samples kept briefly, rolled up into minute, hour and day
+# buckets (min, max, mean, samples) that each have their own retention. Samples are queued in memory
+# and written in batches on a dedicated thread, so the event loop never waits on the disk.
+class RollupStore:
+    def __init__(self, filename, retention=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.filename = filename
+        self.retention = parse_retention(retention)
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._flush_task = None
+        self._pruned_at = 0.0
+        self._db = None
+        # sqlite connections belong to one thread, so every query and write runs on this one
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rollups")
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.filename)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def append(self, players, slots, timestamp=None):
+        self._pending.append((timestamp if timestamp is not None else time.time(), players, slots))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    # Write every queued sample now
+    async def flush(self):
+        rows, self._pending = self._pending, []
+        if rows:
+            try:
+                await self._run(self._write, rows)
+            except Exception as e:
+                logger.error(f"Error writing to '{self.filename}': {e}")
+
+    def _write(self, rows):
+        db = self._connect()
+        with db:
+            db.executemany("INSERT INTO raw (ts, players, slots) VALUES (?, ?, ?)", rows)
+            for name, size, _ in TIERS:
+                if not size:
+                    continue
+                # Fold the batch per bucket first, so each bucket is upserted once per batch
+                buckets = {}
+                for timestamp, players, slots in rows:
+                    bucket = int(timestamp // size * size)
+                    current = buckets.get(bucket)
+                    if current is None:
+                        buckets[bucket] = [players, players, players, 1, slots]
+                    else:
+                        current[0] = min(current[0], players)
+                        current[1] = max(current[1], players)
+                        current[2] += players
+                        current[3] += 1
+                        current[4] = slots
+                db.executemany(f"""
+                    INSERT INTO {name} (bucket, min, max, sum, samples, slots) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (bucket) DO UPDATE SET
+                        min = min(min, excluded.min),
+                        max = max(max, excluded.max),
+                        sum = sum + excluded.sum,
+                        samples = samples + excluded.samples,
+                        slots = excluded.slots
+                """, [(bucket, *values) for bucket, values in buckets.items()])
+        if time.time() - self._pruned_at >= PRUNE_INTERVAL:
+            self._prune()
+
+    def _prune(self):
+        now = self._pruned_at = time.time()
+        db = self._connect()
+        with db:
+            for name, size, _ in TIERS:
+                keep = self.retention[name]
+                if keep:
+                    column = "bucket" if size else "ts"
+                    db.execute(f"DELETE FROM {name} WHERE {column} < ?", (now - keep,))
+
+    # The finest tier that still holds data from `since` and spans the window in at most max_points rows
+    def choose_tier(self, since, until=None, max_points=MAX_POINTS):
+        now = time.time()
+        window = (until if until is not None else now) - since
+        for name, size, spacing in TIERS:
+            keep = self.retention[name]
+            if keep and since < now - keep:
+                continue
+            if window / spacing <= max_points:
+                return name, size
+        return TIERS[-1][:2]
+
+    # Player counts between since and until as (time, min, max, mean, slots) rows from the chosen tier
+    async def series(self, since, until=None, max_points=MAX_POINTS):
+        await self.flush()
+        name, size = self.choose_tier(since, until, max_points)
+        return name, await self._run(self._series, name, size, since, until if until is not None else time.time())
+
+    def _series(self, name, size, since, until):
+        db = self._connect()
+        if not size:
+            return db.execute(
+                "SELECT ts, players, players, players, slots FROM raw WHERE ts >= ? AND ts <= ? ORDER BY ts",
+                (since, until)).fetchall()
+        return db.execute(
+            f"SELECT bucket, min, max, CAST(sum AS REAL) / samples, slots FROM {name} "
+            "WHERE bucket >= ? AND bucket <= ? ORDER BY bucket",
+            (since // size * size, until)).fetchall()
+
+    # Summary of a window, read from the finest tier that covers it
+    async def stats(self, window_seconds, now=None):
+        await self.flush()
+        since = (now if now is not None else time.time()) - window_seconds
+        name, size = self.choose_tier(since, max_points=MAX_POINTS * 10)
+        return await self._run(self._stats, name, size, since)
+
+    def _stats(self, name, size, since):
+        db = self._connect()
+        if size:
+            column, since = "bucket", since // size * size
+            summary = db.execute(f"SELECT min(min), max(max), sum(sum), sum(samples), min(bucket), max(bucket) "
+                                 f"FROM {name} WHERE bucket >= ?", (since,)).fetchone()
+            peak = db.execute(f"SELECT bucket FROM {name} WHERE bucket >= ? ORDER BY max DESC, bucket DESC LIMIT 1",
+                              (since,)).fetchone()
+        else:
+            column = "ts"
+            summary = db.execute("SELECT min(players), max(players), sum(players), count(*), min(ts), max(ts) "
+                                 "FROM raw WHERE ts >= ?", (since,)).fetchone()
+            peak = db.execute("SELECT ts FROM raw WHERE ts >= ? ORDER BY players DESC, ts DESC LIMIT 1",
+                              (since,)).fetchone()
+        latest = db.execute(f"SELECT slots FROM {name} WHERE {column} >= ? ORDER BY {column} DESC LIMIT 1",
+                            (since,)).fetchone()
+
+        result = HistoryStats()
+        min_players, max_players, total, samples, first, last = summary
+        if samples:
+            result.samples = samples
+            result.first, result.last = first, last
+            result.min_players, result.max_players = min_players, max_players
+            result.mean_players = total / samples
+            result.peak_time = peak[0]
+            result.slots = latest[0]
+        return result
+
+    # Write what is still queued and close the database; blocking, for shutdown
+    def close(self):
+        rows, self._pending = self._pending, []
+
+        def finish():
+            if rows:
+                self._write(rows)
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+        try:
+            self._executor.submit(finish).result()
+        except Exception as e:
+            logger.error(f"Error writing to '{self.filename}': {e}")
+        self._executor.shutdown()
@@ -0,0 +1,173 @@
+import asyncio
+import random
+import time
+from loguru import logger
+
+# The SCP:SL API refuses to be polled more often than this
+MIN_INTERVAL = 11
+
+# Picks the next poll interval from the last result: fast while the count moves or the server is
+# nearly full, exponential backoff while it sits at zero or unchanged, never above the request budget
+class AdaptiveInterval:
+    def __init__(self, min_interval, max_interval, budget_per_hour=None, requests_per_poll=1, near_full=0.9):
+        budget_floor = 3600 * requests_per_poll / budget_per_hour if budget_per_hour else 0
+        self.min_interval = max(MIN_INTERVAL, min_interval, budget_floor)
+        self.max_interval = max(self.min_interval, max_interval)
+        self.near_full = near_full
+        self.interval = self.min_interval
+        self._last = None
+
+    # result is (players, slots) from the poll, or None when it failed
+    def next_interval(self, result):
+        if result is None:
+            return self.interval
+
+        players, slots = result
+        changed = self._last is not None and players != self._last
+        busy = slots > 0 and players >= slots * self.near_full
+        if (changed or busy) and players > 0:
+            self.interval = self.min_interval
+        elif players == 0 or self._last is not None:
+            self.interval = min(self.interval * 2, self.max_interval)
+        self._last = players
+        return self.interval
+
+# Runs one poll coroutine at a fixed cadence in a single supervised task that owns the HTTP session
+class PollScheduler:
+    def __init__(self, poll, session_factory, interval, jitter=1.0, policy=None):
+        self.poll = poll
+        self.session_factory = session_factory
+        self.interval = self._clamp(interval)
+        self.base_interval = self.interval
+        self.jitter = max(0.0, jitter)
+        self.policy = policy
+        self.session = None
+        self.ticks = 0
+        self.started_at = None
+        self._task = None
+        self._stopping = False
+        self._restart_delay = 1
+        self._restart_handle = None
+        self._rescheduled = None  # created by _run, so it belongs to the loop that waits on it
+
+    @staticmethod
+    def _clamp(interval):
+        if interval < MIN_INTERVAL:
+            logger.warning(f"Poll interval {interval}s is below the API minimum, using {MIN_INTERVAL}s.")
+            return MIN_INTERVAL
+        return interval
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    # Safe to call from every on_ready/on_resumed; only one poll loop ever runs
+    def start(self):
+        if self._restart_handle is not None:
+            self._restart_handle.cancel()  # a pending crash restart isn't needed any more
+            self._restart_handle = None
+        if self.running:
+            return
+        self._stopping = False
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        self._task = asyncio.ensure_future(self._run())
+        self._task.add_done_callback(self._supervise)
+        mode = "adaptively" if self.policy else f"every {self.interval}s"
+        logger.info(f"Poll scheduler started, polling {mode}.")
+
+    async def stop(self):
+        self._stopping = True
+        if self._restart_handle is not None:
+            self._restart_handle.cancel()
+            self._restart_handle = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                pass  # already logged by _supervise
+            self._task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    # Change the cadence of a running scheduler; the current wait is recalculated right away
+    def reschedule(self, interval, jitter=None, policy=None):
+        self.base_interval = self._clamp(interval)
+        self.policy = policy
+        self.interval = policy.interval if policy else self.base_interval
+        if jitter is not None:
+            self.jitter = max(0.0, jitter)
+        if self._rescheduled is not None:
+            self._rescheduled.set()
+
+    # Polls made so far against what a fixed base_interval cadence would have made
+    def stats(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        fixed_polls = int(elapsed // self.base_interval) + 1 if self.started_at else 0
+        return {
+            "interval": self.interval,
+            "polls": self.ticks,
+            "fixed_polls": fixed_polls,
+            "saved": max(0, fixed_polls - self.ticks),
+            "elapsed": elapsed,
+        }
+
+    def _supervise(self, task):
+        if self._stopping or task.cancelled():
+            return
+        error = task.exception()
+        logger.error(f"Poll scheduler stopped unexpectedly: {error!r}. Restarting in {self._restart_delay}s.")
+        loop = asyncio.get_event_loop()
+        self._restart_handle = loop.call_later(self._restart_delay, self.start)
+        self._restart_delay = min(self._restart_delay * 2, 60)
+
+    async def _run(self):
+        if self.session is None or self.session.closed:
+            self.session = await self.session_factory()
+        self._rescheduled = asyncio.Event()
+
+        next_run = time.monotonic()
+        while True:
+            last_run = next_run
+            result = None
+            try:
+                result = await self.poll(self.session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error during scheduled poll: {e}")
+            self.ticks += 1
+
+            if self.policy is not None:
+                interval = self.policy.next_interval(result)
+                if interval != self.interval:
+                    logger.info(f"Poll interval changed from {self.interval}s to {interval}s.")
+                    self.interval = interval
+
+            # Schedule against the ideal timeline so slow polls don't push the cadence back
+            next_run = last_run + self.interval
+            now = time.monotonic()
+            if next_run < now:
+                missed = int((now - next_run) // self.interval) + 1
+                logger.warning(f"Poll took longer than {self.interval}s, skipping {missed} tick(s).")
+                next_run += missed * self.interval
+
+            jitter = random.uniform(0, self.jitter)
+            while not await self._wait_until(next_run + jitter):
+                # Rescheduled while waiting: count the new interval from the last poll
+                next_run = max(last_run + self.interval, time.monotonic())
+            # A whole cycle ran without crashing, so the next crash restarts quickly again
+            self._restart_delay = 1
+
+    # Sleep until deadline; returns False if reschedule() interrupted the wait
+    async def _wait_until(self, deadline):
+        self._rescheduled.clear()
+        try:
+            await asyncio.wait_for(self._rescheduled.wait(), max(0.0, deadline - time.monotonic()))
+            return False
+        except asyncio.TimeoutError:
+            return True
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import os
+import time
+from array import array
+from bisect import bisect_left, insort
+from loguru import logger
+from snapshot import write_json_atomic
+import metrics
+
+FORMAT_VERSION = 1
+DEFAULT_SAVE_INTERVAL = 300
+DAILY_PEAK_DAYS = 31
+
+# Play time and index share one int in the ranking, so ranking a player costs one int instead of a tuple
+INDEX_BITS = 32
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+# What !seen knows about one player
+class PlayerInfo:
+    __slots__ = ("player_id", "name", "first_seen", "last_seen", "playtime", "server", "online_since")
+
+    def __init__(self, player_id, name, first_seen, last_seen, playtime, server=None, online_since=None):
+        self.player_id = player_id
+        self.name = name
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.playtime = playtime
+        self.server = server
+        self.online_since = online_since
+
+    @property
+    def online(self):
+        return self.server is not None
+
+# Turns each poll's player lists into join/leave events and keeps running totals per player.
+# Players are interned to an index into flat arrays, so a tracked player costs a few dozen bytes
+# plus their id and nickname; !seen is a dict lookup and !top reads the end of a sorted ranking.
+class PlayerSessions:
+    def __init__(self, filename=None, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.filename = filename
+        self.save_interval = save_interval
+        self.ids = []  # player index -> account id
+        self.names = []  # player index -> last nickname
+        self.first_seen = array('d')
+        self.last_seen = array('d')
+        self.playtime = array('I')  # seconds from finished sessions
+        self.online = {}  # player index -> (server name, session start)
+        self.peak = (0, 0.0)  # most players online at once, and when
+        self.daily_peaks = {}  # "YYYY-MM-DD" -> (players, when)
+        self._index = {}  # account id -> player index
+        self._by_name = {}  # casefolded nickname -> player index
+        self._ranking = []  # sorted (playtime << INDEX_BITS | index) of every player
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._save_task = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _intern(self, player_id, name, now):
+        index = self._index.get(player_id)
+        if index is None:
+            index = self._index[player_id] = len(self.ids)
+            self.ids.append(player_id)
+            self.names.append(name)
+            self.first_seen.append(now)
+            self.last_seen.append(now)
+            self.playtime.append(0)
+            insort(self._ranking, index)
+        elif name != self.names[index]:
+            old_key = self.names[index].casefold()
+            if self._by_name.get(old_key) == index:
+                del self._by_name[old_key]
+            self.names[index] = name
+        self._by_name[name.casefold()] = index
+        return index
+
+    def _add_playtime(self, index, seconds):
+        old = self.playtime[index]
+        new = min(INDEX_MASK, old + int(seconds))
+        del self._ranking[bisect_left(self._ranking, old << INDEX_BITS | index)]
+        insort(self._ranking, new << INDEX_BITS | index)
+        self.playtime[index] = new
+
+    # Diff the player lists of a poll against the previous one; returns (joined, left) player indexes.
+    # Servers that failed or don't list players keep their last known players until they answer again.
+    def update(self, results, total_players, now=None):
+        now = now if now is not None else time.time()
+        current = {}
+        polled = set()
+        for result in results:
+            players = result.info.player_list if result.ok else None
+            if players is None:
+                continue
+            polled.add(result.name)
+            for player in players:
+                if not player.player_id:
+                    continue
+                current[self._intern(player.player_id, player.nickname or player.player_id, now)] = result.name
+
+        left = []
+        for index, (server, since) in list(self.online.items()):
+            if index not in current and server in polled:
+                # They left at some point after the last poll that saw them
+                del self.online[index]
+                self._add_playtime(index, self.last_seen[index] - since)
+                left.append(index)
+
+        joined = []
+        for index, server in current.items():
+            session = self.online.get(index)
+            if session is None:
+                self.online[index] = (server, now)
+                joined.append(index)
+            elif session[0] != server:
+                # Switching servers between polls continues the same session
+                self.online[index] = (server, session[1])
+            self.last_seen[index] = now
+
+        for index in joined:
+            logger.bind(event="join", server=self.online[index][0], player=self.ids[index]).debug("{} joined", self.names[index])
+        for index in left:
+            logger.bind(event="leave", player=self.ids[index]).debug("{} left", self.names[index])
+        metrics.PLAYER_EVENTS.inc(len(joined), event="join")
+        metrics.PLAYER_EVENTS.inc(len(left), event="leave")
+        metrics.TRACKED_PLAYERS.set(len(self.ids))
+
+        self._record_peak(total_players, now)
+        if joined or left or current:
+            self._dirty = True
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self._schedule_save()
+        return joined, left
+
+    def _record_peak(self, players, now):
+        if players > self.peak[0]:
+            self.peak = (players, now)
+        day = time.strftime("%Y-%m-%d", time.gmtime(now))
+        if players > self.daily_peaks.get(day, (-1, 0.0))[0]:
+            self.daily_peaks[day] = (players, now)
+            if len(self.daily_peaks) > DAILY_PEAK_DAYS:
+                del self.daily_peaks[min(self.daily_peaks)]
+
+    def today_peak(self, now=None):
+        day = time.strftime("%Y-%m-%d", time.gmtime(now if now is not None else time.time()))
+        return self.daily_peaks.get(day, (0, None))
+
+    def _info(self, index, now):
+        server, since = self.online.get(index, (None, None))
+        playtime = self.playtime[index] + (now - since if since is not None else 0)
+        return PlayerInfo(self.ids[index], self.names[index], self.first_seen[index], self.last_seen[index],
+                          playtime, server, since)
+
+    # Look a player up by account id or by their latest nickname
+    def find(self, query, now=None):
+        now = now if now is not None else time.time()
+        index = self._index.get(query)
+        if index is None:
+            index = self._by_name.get(query.casefold())
+        return self._info(index, now) if index is not None else None
+
+    # The players with the most play time, counting sessions still in progress
+    def top_playtime(self, limit=10, now=None):
+        now = now if now is not None else time.time()
+        # Play time only grows while online, so the leaders are among the top offline
+        # totals plus whoever is online right now
+        candidates = {key & INDEX_MASK for key in self._ranking[-(limit + len(self.online)):]}
+        candidates.update(self.online)
+        infos = [self._info(index, now) for index in candidates]
+        infos.sort(key=lambda info: info.playtime, reverse=True)
+        return infos[:limit]
+
+    # Restore totals saved by a previous run; nobody counts as online until the next poll sees them
+    def load(self):
+        if not self.filename or not os.path.isfile(self.filename):
+            return
+        try:
+            with open(self.filename, 'rb') as f:
+                data = json.load(f)
+            if data.get("version") != FORMAT_VERSION:
+                raise ValueError(f"unsupported format version {data.get('version')}")
+            ids, names = data["ids"], data["names"]
+            first_seen = array('d', data["first_seen"])
+            last_seen = array('d', data["last_seen"])
+            playtime = array('I', data["playtime"])
+        except Exception as e:
+            logger.error(f"Error reading from '{self.filename}': {e}")
+            return
+
+        self.ids, self.names = ids, names
+        self.first_seen, self.last_seen, self.playtime = first_seen, last_seen, playtime
+        self._index = {player_id: index for index, player_id in enumerate(ids)}
+        self._by_name = {name.casefold(): index for index, name in enumerate(names)}
+        self._ranking = sorted(seconds << INDEX_BITS | index for index, seconds in enumerate(playtime))
+        self.peak = tuple(data.get("peak") or (0, 0.0))
+        self.daily_peaks = {day: tuple(peak) for day, peak in (data.get("daily_peaks") or {}).items()}
+        self.online = {}
+        metrics.TRACKED_PLAYERS.set(len(self.ids))
+        logger.info(f"Loaded {len(self.ids):,} tracked players from '{self.filename}'.")
+
+    # Copy the columns on the loop (cheap memcpy for the arrays); encoding and writing happen elsewhere
+    def _state(self):
+        return {
+            "version": FORMAT_VERSION,
+            "ids": list(self.ids),
+            "names": list(self.names),
+            "first_seen": array('d', self.first_seen),
+            "last_seen": array('d', self.last_seen),
+            "playtime": array('I', self.playtime),
+            "peak": self.peak,
+            "daily_peaks": dict(self.daily_peaks),
+        }
+
+    def _write(self, state):
+        for column in ("first_seen", "last_seen", "playtime"):
+            state[column] = state[column].tolist()
+        write_json_atomic(json.dumps(state, separators=(',', ':')).encode('utf-8'), self.filename)
+
+    def _schedule_save(self):
+        if not self.filename or (self._save_task is not None and not self._save_task.done()):
+            return
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._save_task = asyncio.ensure_future(self._save(self._state()))
+
+    async def _save(self, state):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, state)
+            logger.debug(f"Player sessions written to '{self.filename}'.")
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error writing to '{self.filename}': {e}")
+
+    # Write any unsaved totals; blocking, for shutdown. Sessions still open are saved up to their last poll.
+    def close(self):
+        if not self.filename or not (self._dirty or self.online):
+            return
+        state = self._state()
+        playtime = state["playtime"]
+        for index, (server, since) in self.online.items():
+            playtime[index] = min(INDEX_MASK, playtime[index] + int(self.last_seen[index] - since))
+        try:
+            self._write(state)
+        except Exception as e:
+            logger.error(f"Error writing to '{self.filename}': {e}")
+        self._dirty = False
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from loguru import logger
+from models import ServerInfo, ModelError
+
+# An immutable view of one poll; commands read this instead of the JSON file.
+# servers maps each server name to its ServerInfo, or to an error message when the poll failed.
+class Snapshot:
+    __slots__ = ("version", "fetched_at", "fetched_monotonic", "servers", "players", "slots", "online", "_data")
+
+    def __init__(self, version, servers, fetched_at=None):
+        self.version = version
+        now = time.time()
+        self.fetched_at = fetched_at if fetched_at is not None else now
+        # Snapshots loaded from disk are as old as their fetched_at, not as old as this process
+        self.fetched_monotonic = time.monotonic() - max(0.0, now - self.fetched_at)
+        self.servers = servers
+        infos = [server for server in servers.values() if isinstance(server, ServerInfo)]
+        self.players = sum(info.players for info in infos)
+        self.slots = sum(info.slots for info in infos)
+        self.online = len(infos)
+        self._data = None
+
+    @classmethod
+    def from_results(cls, version, results, fetched_at=None):
+        return cls(version, {result.name: (result.info if result.ok else result.error) for result in results}, fetched_at)
+
+    # Rebuild a snapshot from its JSON form; entries that no longer validate become errors.
+    # Older versions saved the raw API response, whose "Servers" is a list; its entries are named by ID.
+    @classmethod
+    def from_json(cls, version, data, fetched_at=None):
+        entries = data.get("Servers") or {}
+        if isinstance(entries, list):
+            entries = {str(entry.get("ID") or index) if isinstance(entry, dict) else str(index): entry
+                       for index, entry in enumerate(entries)}
+        elif not isinstance(entries, dict):
+            raise ModelError(f"Servers must be an object, got {type(entries).__name__}")
+        servers = {}
+        for name, entry in entries.items():
+            try:
+                servers[name] = entry["Error"] if isinstance(entry, dict) and "Error" in entry else ServerInfo.from_dict(entry)
+            except ModelError as e:
+                servers[name] = f"Error parsing server data: {e}"
+        return cls(version, servers, fetched_at)
+
+    @property
+    def success(self):
+        return self.online > 0
+
+    @property
+    def count(self):
+        return f"{self.players}/{self.slots}"
+
+    # The JSON form written to disk and shown by !json_test, built only when something asks for it
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = {
+                "Success": self.success,
+                "Players": self.count,
+                "Servers": {
+                    name: (server.to_dict() if isinstance(server, ServerInfo) else {"Error": server})
+                    for name, server in self.servers.items()
+                },
+            }
+        return self._data
+
+    @property
+    def age(self):
+        return time.monotonic() - self.fetched_monotonic
+
+EMPTY_SNAPSHOT = Snapshot(0, {}, fetched_at=0.0)
+
+# Write data to filename atomically: a temp file in the same directory, then rename over it
+def write_json_atomic(data, filename):
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+# Holds the latest snapshot in memory and optionally persists it behind the event loop
+class SnapshotStore:
+    def __init__(self, filename=None, persist=False):
+        self.filename = filename
+        self.persist = persist and bool(filename)
+        self._current = EMPTY_SNAPSHOT
+        self._last_written = None
+        self._pending = None
+        self._write_task = None
+
+    @property
+    def current(self):
+        return self._current
+
+    def update(self, results, fetched_at=None):
+        self._current = Snapshot.from_results(self._current.version + 1, results, fetched_at)
+        if self.persist:
+            self._schedule_write(self._current.data)
+        return self._current
+
+    # Seed the store from the file left by a previous run, so commands work before the first poll
+    def load(self):
+        if not self.filename or not os.path.isfile(self.filename):
+            return self._current
+        try:
+            with open(self.filename, 'rb') as f:
+                payload = f.read()
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                raise ModelError("expected a JSON object")
+            snapshot = Snapshot.from_json(self._current.version + 1, data, fetched_at=os.path.getmtime(self.filename))
+        except Exception as e:
+            logger.error(f"Error reading from '{self.filename}': {e}")
+            return self._current
+        self._last_written = payload
+        self._current = snapshot
+        return self._current
+
+    def _schedule_write(self, data):
+        payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+        if self._write_task is not None and not self._write_task.done():
+            # The running write picks up the newest payload when it finishes, and skips it if
+            # that is what it just wrote
+            self._pending = payload
+            return
+        if payload == self._last_written:
+            return
+        self._pending = None
+        self._write_task = asyncio.ensure_future(self._write(payload))
+
+    async def _write(self, payload):
+        loop = asyncio.get_running_loop()
+        while payload is not None:
+            try:
+                await loop.run_in_executor(None, write_json_atomic, payload, self.filename)
+                self._last_written = payload
+                logger.debug(f"Snapshot written to '{self.filename}'.")
+            except Exception as e:
+                logger.error(f"Error writing to '{self.filename}': {e}")
+            payload, self._pending = self._pending, None
+            if payload == self._last_written:
+                payload = None
+
+    async def flush(self):
+        if self._write_task is not None:
+            await self._write_task
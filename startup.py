@@ -0,0 +1,72 @@
+import builtins
+import time
+
+# Times startup phases and top-level imports until on_ready; enabled with --startup-profile
+class StartupProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []
+        self.imports = {}
+        self._depth = 0
+        self._original_import = None
+        self._reported = False
+        if enabled:
+            self.install_import_hook()
+
+    # Wrap __import__ so the outermost import of each module is timed, including everything it pulls in
+    def install_import_hook(self):
+        if self._original_import is not None:
+            return
+        original_import = self._original_import = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if self._depth or level:
+                self._depth += 1
+                try:
+                    return original_import(name, globals, locals, fromlist, level)
+                finally:
+                    self._depth -= 1
+
+            started = time.perf_counter()
+            self._depth += 1
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                self._depth -= 1
+                elapsed = time.perf_counter() - started
+                # Imports of already loaded modules cost next to nothing and are not worth listing
+                if elapsed >= 0.0005:
+                    self.imports[name] = self.imports.get(name, 0.0) + elapsed
+
+        builtins.__import__ = timed_import
+
+    def remove_import_hook(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    # Record a phase that started at the end of the previous one
+    def mark(self, name):
+        if not self.enabled or self._reported:
+            return
+        now = time.perf_counter()
+        previous_end = self.phases[-1][1] + self.phases[-1][2] if self.phases else 0.0
+        self.phases.append((name, previous_end, now - self.start - previous_end))
+
+    def report(self):
+        if not self.enabled or self._reported:
+            return None
+        self._reported = True
+        self.remove_import_hook()
+
+        lines = [f"Startup profile: {time.perf_counter() - self.start:.3f}s until ready"]
+        lines.append("Phases:")
+        for name, offset, elapsed in self.phases:
+            lines.append(f"  {elapsed * 1000:9.1f} ms  (at {offset * 1000:8.1f} ms)  {name}")
+        lines.append("Imports:")
+        for name, elapsed in sorted(self.imports.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"  {elapsed * 1000:9.1f} ms  {name}")
+        report = "\n".join(lines)
+        print(report, flush=True)
+        return report
@@ -1,112 +1,256 @@
 import os
 import sys
+import json
+import asyncio
+import hashlib
 import aiohttp
-import zipfile
-import shutil
 import yaml
 from loguru import logger
 
+RELEASES_URL = "https://api.github.com/repos/Josephfallen/SCP-SL-Discord-Bot/releases/latest"
+CACHE_FILE = 'update_cache.json'
+CHUNK_SIZE = 64 * 1024
+DEFAULT_CHECK_INTERVAL = 6 * 3600
+
 # Function to load the config file
 def load_config():
     config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yml')  # Get full path
     logger.info(f"Looking for config file at: {config_path}")
-    
+
     if not os.path.isfile(config_path):
         logger.error(f"Config file not found: {config_path}. Using default settings.")
-        return {'auto_update': True}  # Default settings
-    
+        return {'auto_updates': True}  # Default settings
+
     try:
         with open(config_path, 'r') as config_file:
-            return yaml.safe_load(config_file) or {'auto_update': True}  # Default if file is empty
+            return yaml.safe_load(config_file) or {'auto_updates': True}  # Default if file is empty
     except Exception as e:
         logger.error(f"Error loading config: {e}")
-        return {'auto_update': True}  # Default settings on error
+        return {'auto_updates': True}  # Default settings on error
+
+# Stream a download to disk in chunks, hashing as it goes; returns the sha256 hex digest
+async def download_file(session, url, path):
+    loop = asyncio.get_running_loop()
+    hasher = hashlib.sha256()
+    async with session.get(url) as response:
+        if response.status != 200:
+            raise RuntimeError(f"Failed to download {url}: {response.status} - {response.reason}")
+        logger.info(f"Response content type: {response.headers.get('Content-Type')}")
+        with open(path, "wb") as f:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                hasher.update(chunk)
+                await loop.run_in_executor(None, f.write, chunk)
+    return hasher.hexdigest()
 
-# Function to update the bot code from GitHub
-async def update_bot_code(download_url):
+# Files the release ships as templates but that hold each install's own settings
+KEEP_FILES = {'key.py'}
+
+# Extract the release zip and swap in its top-level modules; blocking, so it runs in an executor.
+# Everything is extracted and checked before the first file is replaced, so a bad release
+# leaves the running install untouched.
+def install_zip(zip_file_path, repo_path):
+    import zipfile
+    import shutil
+    import tempfile
+
+    staging_path = tempfile.mkdtemp(prefix='update-', dir=repo_path)
     try:
-        repo_path = os.path.dirname(os.path.abspath(__file__))  # Path to the repo
-        
-        # Download the zip file
-        async with aiohttp.ClientSession() as session:
-            async with session.get(download_url) as response:
-                if response.status == 200:
-                    # Accept any binary response as a valid zip
-                    content_type = response.headers.get('Content-Type')
-                    logger.info(f"Response content type: {content_type}")
-
-                    zip_file_path = os.path.join(repo_path, "update.zip")
-                    with open(zip_file_path, "wb") as zip_file:
-                        zip_file.write(await response.read())
-                    logger.info("Downloaded zip file.")
-
-                    # Extract the zip file
-                    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-                        extracted_folder = zip_ref.namelist()[0].split('/')[0]  # Get the first folder in the zip
-                        zip_ref.extractall(repo_path)
-                    logger.info("Extracted zip file.")
-
-                    # Delete old main.py
-                    old_main_path = os.path.join(repo_path, "main.py")
-                    if os.path.exists(old_main_path):
-                        os.remove(old_main_path)
-                        logger.info("Deleted old main.py.")
-
-                    # Move the new main.py to the current directory
-                    new_main_path = os.path.join(repo_path, extracted_folder, "main.py")
-                    if os.path.exists(new_main_path):
-                        shutil.move(new_main_path, os.path.join(repo_path, "main.py"))
-                        logger.info("Updated main.py.")
-                    else:
-                        logger.error("New main.py not found after extraction.")
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            extracted_folder = zip_ref.namelist()[0].split('/')[0]  # Get the first folder in the zip
+            zip_ref.extractall(staging_path)
+        logger.info("Extracted zip file.")
 
-                    # Clean up
-                    shutil.rmtree(os.path.join(repo_path, extracted_folder))  # Remove the extracted folder
-                    os.remove(zip_file_path)  # Remove the zip file
-                    logger.info("Cleaned up temporary files.")
+        release_path = os.path.join(staging_path, extracted_folder)
+        modules = sorted(name for name in os.listdir(release_path)
+                         if name.endswith('.py') and name not in KEEP_FILES)
+        if 'main.py' not in modules:
+            raise RuntimeError("main.py not found in the release")
+        for name in modules:
+            with open(os.path.join(release_path, name), 'rb') as f:
+                compile(f.read(), name, 'exec')
 
-                    # Restart the bot
-                    logger.info("Restarting the bot...")
-                    os.execv(sys.executable, ['python'] + sys.argv)
+        # Staged on the same filesystem, so each swap is an atomic rename
+        for name in modules:
+            os.replace(os.path.join(release_path, name), os.path.join(repo_path, name))
+        logger.info(f"Updated {len(modules)} files: {', '.join(modules)}.")
+    finally:
+        # Clean up
+        shutil.rmtree(staging_path, ignore_errors=True)
+        os.remove(zip_file_path)
+        logger.info("Cleaned up temporary files.")
 
-                else:
-                    logger.error(f"Failed to download zip: {response.status} - {response.reason}")
+# Replace this process with a fresh interpreter running the same command
+def restart_process():
+    os.execv(sys.executable, ['python'] + sys.argv)
+
+# Function to update the bot code from GitHub. on_restart, when given, is awaited instead of
+# restarting here, so the caller can shut down cleanly and restart afterwards.
+async def update_bot_code(download_url, expected_sha256=None, on_restart=None):
+    repo_path = os.path.dirname(os.path.abspath(__file__))  # Path to the repo
+    zip_file_path = os.path.join(repo_path, "update.zip")
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=30, sock_read=60)) as session:
+            digest = await download_file(session, download_url, zip_file_path)
+        logger.info("Downloaded zip file.")
+
+        if expected_sha256 is not None and digest != expected_sha256.lower():
+            logger.error(f"Checksum mismatch for update: expected {expected_sha256}, got {digest}. Update aborted.")
+            os.remove(zip_file_path)
+            return False
+
+        await asyncio.get_running_loop().run_in_executor(None, install_zip, zip_file_path, repo_path)
+
+        # Restart the bot
+        logger.info("Restarting the bot...")
+        if on_restart is not None:
+            await on_restart()
+            return True
+        await logger.complete()
+        restart_process()
 
     except Exception as e:
         logger.error(f"Error updating bot code: {e}")
+        if os.path.exists(zip_file_path):
+            os.remove(zip_file_path)
+        return False
 
+# Checks GitHub for new releases in the background; never waits on console input
+class UpdateChecker:
+    def __init__(self, bot_version, config=None, on_restart=None):
+        self.bot_version = bot_version
+        self.on_restart = on_restart
+        self.configure(config if config is not None else load_config())
+        self.cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_FILE)
+        self.etag = None
+        self.release_info = None
+        self.available = None
+        self._task = None
+        self._load_cache()
 
-# Function to check for updates
-async def check_for_updates(bot_version, version_suffix):
-    config = load_config()  # Load config to check auto update setting
-    if not config.get('auto_update', True):
-        logger.info("Auto-update is disabled in the config. Skipping update.")
-        return  # Skip update process if auto_update is set to false
+    # Read the update settings; also called when config.yml is reloaded
+    def configure(self, config):
+        self.enabled = config.get('auto_updates', config.get('auto_update', True))
+        self.interval = max(300, config.get('UPDATE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL))
+        self.auto_install = config.get('UPDATE_APPROVAL', 'manual') == 'auto'
+        self.require_checksum = config.get('UPDATE_REQUIRE_CHECKSUM', True)
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://api.github.com/repos/Josephfallen/SCP-SL-Discord-Bot/releases/latest") as response:
-                if response.status == 200:
-                    release_info = await response.json()
-                    latest_version = release_info['tag_name']
-                    logger.info(f"Fetched latest release: {latest_version}")
-
-                    # Check if there's a new version by comparing only the version number part
-                    if latest_version != bot_version:
-                        logger.info(f"A new version is available: {latest_version}. Would you like to update? (Y/N)")
-                        user_input = input("Update now? (Y/N): ").strip().upper()
-                        if user_input == 'Y':
-                            download_url = next((asset['browser_download_url'] for asset in release_info['assets'] if asset['name'].endswith('.zip')), None)
-                            if download_url:
-                                await update_bot_code(download_url)
-                            else:
-                                logger.error("No valid download URL found for the new version.")
-                        else:
-                            logger.info("Update skipped.")
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+            self.etag = cache.get('etag')
+            self.release_info = cache.get('release')
+        except (OSError, ValueError):
+            pass
+
+    def _save_cache(self):
+        from snapshot import write_json_atomic
+        try:
+            payload = json.dumps({'etag': self.etag, 'release': self.release_info}).encode('utf-8')
+            write_json_atomic(payload, self.cache_path)
+        except Exception as e:
+            logger.error(f"Error writing update cache: {e}")
+
+    def start(self):
+        if not self.enabled:
+            logger.info("Auto-update is disabled in the config. Skipping update checks.")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+                if self.available and self.auto_install:
+                    await self.install()
+            except Exception:
+                # One bad check must not end the checker; the next interval tries again
+                logger.exception("Error in the update checker")
+            await asyncio.sleep(self.interval)
+
+    # Fetch the latest release, sending the cached ETag so an unchanged release costs a 304
+    async def check(self):
+        headers = {'Accept': 'application/vnd.github+json'}
+        if self.etag and self.release_info:
+            headers['If-None-Match'] = self.etag
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                async with session.get(RELEASES_URL, headers=headers) as response:
+                    if response.status == 304:
+                        logger.debug("Latest release unchanged since the last check.")
+                    elif response.status == 200:
+                        self.release_info = await response.json()
+                        self.etag = response.headers.get('ETag')
+                        self._save_cache()
                     else:
-                        logger.info("You are running the latest version.")
-                else:
-                    logger.error(f"Failed to fetch latest release: {response.status} - {response.reason}")
+                        logger.error(f"Failed to fetch latest release: {response.status} - {response.reason}")
+                        return self.available
+        except Exception as e:
+            logger.error(f"Error checking for updates: {e}")
+            return self.available
 
-    except Exception as e:
-        logger.error(f"Error checking for updates: {e}")
+        latest_version = self.release_info.get('tag_name') if isinstance(self.release_info, dict) else None
+        if not latest_version:
+            logger.error("Latest release has no tag_name, ignoring it.")
+            return self.available
+        if latest_version != self.bot_version:
+            if self.available is None or self.available['tag_name'] != latest_version:
+                hint = "Installing it now." if self.auto_install else "Use !update install to install it."
+                logger.warning(f"A new version is available: {latest_version}. {hint}")
+            self.available = self.release_info
+        else:
+            logger.info("You are running the latest version.")
+            self.available = None
+        return self.available
+
+    # The sha256 of the release zip, from the asset digest GitHub publishes or a .sha256 asset
+    async def _expected_sha256(self, asset):
+        digest = asset.get('digest') or ''
+        if digest.startswith('sha256:'):
+            return digest.split(':', 1)[1]
+
+        name = asset.get('name', '') + '.sha256'
+        checksum_asset = next((a for a in self.available.get('assets') or [] if a.get('name') == name), None)
+        if checksum_asset is None or not checksum_asset.get('browser_download_url'):
+            return None
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+                async with session.get(checksum_asset['browser_download_url']) as response:
+                    if response.status != 200:
+                        return None
+                    text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Error downloading the update checksum: {e}")
+            return None
+        return text.split()[0] if text.split() else None
+
+    # Download and install the available update; returns False if it failed or there was none
+    async def install(self):
+        if not self.available:
+            logger.info("No update available.")
+            return False
+        try:
+            return await self._install()
+        except Exception:
+            logger.exception("Error installing the update")
+            return False
+
+    async def _install(self):
+        asset = next((asset for asset in self.available.get('assets') or []
+                      if asset.get('name', '').endswith('.zip') and asset.get('browser_download_url')), None)
+        if asset is None:
+            logger.error("No valid download URL found for the new version.")
+            return False
+
+        expected_sha256 = await self._expected_sha256(asset)
+        if expected_sha256 is None and self.require_checksum:
+            logger.error("No checksum published for the new version. Update aborted.")
+            return False
+
+        return await update_bot_code(asset['browser_download_url'], expected_sha256, self.on_restart)